@@ -1,32 +1,142 @@
+import io
 import os
-import inspect
-import datetime
+import csv
+import time
+import queue
+import atexit
+import logging
+import functools
+import threading
+import logging.handlers
+
+
+# Log files live next to this module. __file__ is already absolute for
+# imported modules, so no abspath is needed.
+_LOG_DIR = os.path.dirname(__file__) or '.'
+
+
+@functools.lru_cache(maxsize=128)
+def _resolve_log_path(subsystem=''):
+    # Each path is built once per name and then served from the cache
+    if subsystem:
+        return os.path.join(_LOG_DIR, f'logfile_{subsystem}.txt')
+    return os.path.join(_LOG_DIR, 'logfile.txt')
+
+
+# Resolve the main log's path once at import rather than on every call
+_LOG_PATH = _resolve_log_path('')
+
+# Once the log reaches _MAX_LOG_SIZE it is renamed to logfile.txt.1 (older
+# copies shift up to .2 and .3) and a new file is started, so the log
+# can't grow without bound
+_MAX_LOG_SIZE = 10 * 1024 * 1024
+_BACKUP_COUNT = 3
+
+
+class _EntryFormatter(logging.Formatter):
+    """
+    Formats a record passed in by log() as one CSV row. The fields travel
+    on the record as a tuple so they are formatted here, on the listener
+    thread, rather than by the caller. csv.writer quotes any field that
+    contains a comma, quote or newline, which error messages often do.
+    """
+    # (second, formatted timestamp) of the most recent record. Only the
+    # listener thread formats records, so this needs no lock.
+    _last_timestamp = (None, '')
+
+    def __init__(self):
+        super().__init__()
+        # Reused for every row. The writer ends each row itself (it only
+        # quotes embedded newlines if it knows '\n' is the terminator), so
+        # the handler's terminator is cleared below.
+        self._row = io.StringIO()
+        self._writer = csv.writer(self._row, lineterminator='\n')
+
+    def formatTime(self, record, datefmt=None):
+        # Records within the same second reuse the formatted timestamp
+        now = int(record.created)
+        second, timestamp = self._last_timestamp
+        if now != second:
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+            self._last_timestamp = (now, timestamp)
+        return timestamp
+
+    def format(self, record):
+        method, message, error, doi, ref_index, main_lookup = record.entry
+
+        # Include the reference to the original paper the label came from
+        if ref_index is not None and main_lookup is not None:
+            ref_info = f"Reference number {ref_index} of paper with doi {main_lookup}"
+        else:
+            ref_info = ''
+
+        # Fields that were not given are left empty so the columns stay aligned
+        row = self._row
+        row.seek(0)
+        row.truncate()
+        self._writer.writerow((self.formatTime(record), method or '', message or '',
+                               error or '', doi or '', ref_info))
+        return row.getvalue()
+
+
+# log() only hands the record to a QueueHandler. A QueueListener thread
+# takes records off the queue and writes them through the rotating file
+# handler, so callers never block on disk I/O. Each entry is one CSV row.
+_file_handler = logging.handlers.RotatingFileHandler(
+    _LOG_PATH, maxBytes=_MAX_LOG_SIZE, backupCount=_BACKUP_COUNT, encoding='utf-8', delay=True)
+_file_handler.setFormatter(_EntryFormatter())
+_file_handler.terminator = ''
+
+_queue = queue.SimpleQueue()
+_listener = logging.handlers.QueueListener(_queue, _file_handler)
+
+_logger = logging.getLogger('shrew')
+_logger.setLevel(logging.ERROR)
+_logger.propagate = False
+_logger.addHandler(logging.handlers.QueueHandler(_queue))
+
+# Stops and restarts the listener in log_sync()
+_sync_lock = threading.Lock()
 
 
 def log(message=None, method=None, error=None, doi=None, ref_index=None, main_lookup=None):
-    filename = get_path()
+    _logger.error('', extra={'entry': (method, message, error, doi, ref_index, main_lookup)})
+
+
+def log_sync():
+    """
+    Block until every entry logged so far is written and fsynced.
 
-    # Create timestamp for the error
-    timestamp = '{:%Y-%m-%d %H:%M:%S}'.format(datetime.datetime.now())
+    log() itself is not durable: entries are written by the listener thread
+    some time after the call returns, and never fsynced. Call this at the
+    points where losing the most recent entries would matter, rather than
+    syncing after every entry.
+    """
+    with _sync_lock:
+        # stop() returns once the listener has handled everything queued
+        _listener.stop()
+        try:
+            _file_handler.acquire()
+            try:
+                if _file_handler.stream is not None:
+                    _file_handler.flush()
+                    os.fsync(_file_handler.stream.fileno())
+            finally:
+                _file_handler.release()
+        finally:
+            _listener.start()
 
-    # If coming from a label, construct the reference to original paper
-    if ref_index is not None and main_lookup is not None:
-        ref_info = 'Reference number %i of paper with doi %s' % (ref_index, main_lookup)
-    else:
-        ref_info = None
 
-    # Construct the full error log message as CSV line
-    message_parts = [timestamp, method, message, error, doi, ref_info]
-    error_log = ', '.join(part for part in message_parts if part is not None)
-    error_log = error_log + '\n\n'
+def get_path(subsystem=''):
+    return _resolve_log_path(subsystem)
 
-    #print(error_log)
 
-    with open(filename, 'a') as file:
-        file.write(error_log)
+def _stop_listener():
+    # Let the listener finish what is queued before the interpreter exits
+    with _sync_lock:
+        _listener.stop()
+    _file_handler.close()
 
 
-def get_path():
-    current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
-    filename = current_dir + '/logfile.txt'
-    return filename
+_listener.start()
+atexit.register(_stop_listener)
@@ -1,8 +1,14 @@
 # Standard
+import re
 import sys
 import os
-import inspect
+import json
+import atexit
 import subprocess
+import threading
+import functools
+from enum import IntEnum
+from collections import OrderedDict
 
 # Third-party
 from PyQt5.QtWidgets import *
@@ -13,10 +19,8 @@ from PyQt5.QtGui import *
 from mendeley import client_library
 from mendeley.api import API
 from mendeley import db_interface as db
-
-
-import reference_resolver as rr
 from shrew_utils import get_truncated_display_string as td
+from shrew_utils import is_valid_doi, LazyModule, TokenBucket
 import error_logging
 
 # I'd like to only have shrew_errors, but then the
@@ -28,6 +32,33 @@ from mendeley.errors import *
 from pypub.pypub_errors import *
 from pdfetch.pdfetch_errors import *
 
+# reference_resolver isn't needed until references are first looked up,
+# so its import is put off until then rather than slowing down startup.
+rr = LazyModule('reference_resolver')
+
+
+class DocStatus(IntEnum):
+    """
+    Whether a document is in the user's library, as shown by the
+    indicator next to the text box and the reference label colors.
+    """
+    MISSING = 0             # Not found in library (red)
+    IN_LIB_NO_FILE = 1      # Found, but there is no file (orange)
+    IN_LIB_WITH_FILE = 2    # Found, with file attached (green)
+    UNKNOWN = 3             # Not looked up (yet)
+
+
+# Statuses for a document that is in the library
+_IN_LIB = frozenset((DocStatus.IN_LIB_NO_FILE, DocStatus.IN_LIB_WITH_FILE))
+
+# The (has_file, in_lib) database fields recorded for each status. Any
+# other status is recorded as unknown, (None, None).
+_ENTRY_FLAGS = {
+    DocStatus.MISSING: (0, 0),
+    DocStatus.IN_LIB_NO_FILE: (0, 1),
+    DocStatus.IN_LIB_WITH_FILE: (1, 1),
+}
+
 
 class EntryWindow(QWidget):
     """
@@ -61,9 +92,18 @@ class EntryWindow(QWidget):
         self.fModel = FunctionModel(self)
         self.data = Data()
 
-        # Connect copy to clipboard shortcut
-        self.copy_shortcut = QShortcut(QKeySequence("Ctrl+C"), self)
-        self.copy_shortcut.activated.connect(_copy_to_clipboard)
+        # Reference labels waiting on a library lookup, keyed by DOI, and
+        # the DOIs that haven't been sent off for lookup yet
+        self._pending_labels = {}
+        self._queued_dois = []
+
+        # Bumped whenever the reference labels are cleared, so results from
+        # lookups started for the old labels can be told apart
+        self._ref_generation = 0
+
+        # Incremented by each update_document_status() lookup so only the
+        # latest is shown
+        self._status_request = 0
 
         self.parent_tab_window=parent_tab_window
         self.encapsulating_window = encapsulating_window
@@ -94,10 +134,17 @@ class EntryWindow(QWidget):
         self.get_all_refs = QPushButton('Add All References')
         self.resolve_dois = QPushButton('Resolve DOIs to References')
 
+        # Checking the library on every keystroke is wasted work, so the
+        # check runs once typing has paused for 300 ms
+        self._text_timer = QTimer(self)
+        self._text_timer.setSingleShot(True)
+        self._text_timer.setInterval(300)
+        self._text_timer.timeout.connect(self.text_changed)
+
         # Set connections to functions
-        self.textEntry.textChanged.connect(self.text_changed)
-        self.textEntry.returnPressed.connect(self.get_refs)
-        self.get_references.clicked.connect(self.get_refs)
+        self.textEntry.textChanged.connect(lambda: self._text_timer.start())
+        self.textEntry.returnPressed.connect(self._entry_returned)
+        self.get_references.clicked.connect(lambda: self.get_refs())
         self.open_notes.clicked.connect(self.show_main_notes_box)
         self.add_to_lib.clicked.connect(self.add_to_library_from_main)
         self.get_all_refs.clicked.connect(self.add_all_refs)
@@ -180,8 +227,8 @@ class EntryWindow(QWidget):
         self.setLayout(self.vbox)
 
         # Connect copy to clipboard shortcut
-        self.copy_shortcut = QShortcut(QKeySequence("Ctrl+C"), self)
-        self.copy_shortcut.activated.connect(lambda: _copy_to_clipboard(self.textEntry.textCursor().selectedText()))
+        self.copy_shortcut = QShortcut(QKeySequence.Copy, self)
+        self.copy_shortcut.activated.connect(_copy_selection)
 
 
     # +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+= Start of Functions
@@ -193,10 +240,21 @@ class EntryWindow(QWidget):
         doc_id = self.doc_selector.value
         self.update_document_status(doi=doc_id, adding=False, sync=False, popups=False)
 
-    def get_refs(self):
+    def _entry_returned(self):
+        # Enter shouldn't wait out the typing delay, so run the pending
+        # library check now rather than after the references are requested
+        if self._text_timer.isActive():
+            self._text_timer.stop()
+            self.text_changed()
+        self.get_refs()
+
+    def get_refs(self, on_done=None):
         """
         Gets references for paper corresponding to the DOI in text field.
         Displays reference information in scrollable area.
+
+        The references are retrieved on a worker thread. If given, on_done
+        is called once they are displayed.
         """
         self.response_label.hide()
 
@@ -207,22 +265,26 @@ class EntryWindow(QWidget):
             self._set_response_message('Please enter text above.')
             return
 
+        self.response_label.setText('Retrieving references...')
+        self.response_label.show()
+
         # Resolve DOI and get references
-        refs = self.fModel.retrieve_only_refs(doi=entered_doi)
+        self.fModel.request_refs(entered_doi, lambda refs, texts: self._show_refs(entered_doi, refs, texts, on_done))
 
+    def _show_refs(self, entered_doi, refs, texts, on_done=None):
         if refs is None or len(refs) == 0:
             self.data.references = None
+            self.response_label.hide()
             _send_msg('No references found.')
             return
 
         # First clean up existing GUI window.
         # If there are widgets in the layout (i.e. from the last call to 'get_refs'),
         # delete all of those reference labels before adding more.
-        _delete_all_widgets(self.ref_items_layout)
+        self._clear_ref_labels()
 
-        for ref in refs:
-            ref_label = self.ref_to_label(ref)
-            self.ref_items_layout.insertWidget(self.ref_area_layout.count() - 1, ref_label)
+        _add_widgets(self.ref_items_layout, [self.ref_to_label(ref, text) for ref, text in zip(refs, texts)])
+        self.lookup_ref_statuses()
 
         # Add entry to history
         self.doc_selector.add_to_history(entered_doi)
@@ -230,6 +292,9 @@ class EntryWindow(QWidget):
         self.response_label.hide()
         self.ref_area.show()
 
+        if on_done is not None:
+            on_done()
+
     #
     # For "Open Notes", see "Notes Box Display Functions" section below.
     #
@@ -239,7 +304,7 @@ class EntryWindow(QWidget):
         Adds paper corresponding to the DOI in the text field to the user library,
         if it is not already there.
         """
-        if self.doc_selector.status in (1,2):
+        if self.doc_selector.status in _IN_LIB:
             _send_msg('Paper is already in library.')
             return
 
@@ -248,29 +313,8 @@ class EntryWindow(QWidget):
             self._set_response_message('Please enter text above.')
             return
 
-        try:
-            self.library.add_to_library(doi)
-        except UnsupportedPublisherError as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_main', message='Unsupported publisher', error=str(exc), doi=doi)
-            _send_msg('Publisher is not yet supported.\nDocument not added.')
-            return
-        except CallFailedException as call:
-            error_logging.log(method='gui.Window.add_to_library_from_main', message='Call failed', error=str(call), doi=doi)
-            _send_msg(str(call))
-        except ParseException or AttributeError as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_main', message='Error while parsing article webpage',
-                error=str(exc), doi=doi)
-            _send_msg('Error while parsing article webpage.')
-        except PDFError:
-            _send_msg('PDF could not be retrieved.')
-        except Exception as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_main', error=str(exc), doi=doi)
-            _send_msg(str(exc))
-
-        # Add entry to history
-        self.doc_selector.add_to_history(doi)
-
-        self.update_document_status(doi, adding=True)
+        self._set_response_message('Adding to library...')
+        _add_to_library(self, doi)
 
     def move_to_trash(self, doi=None):
         """
@@ -293,32 +337,24 @@ class EntryWindow(QWidget):
             entry_type = self.doc_selector.entry_type
             value = self.doc_selector.value
 
-        try:
-            self.library.trash_document(**{entry_type: value})
-        except DocNotFoundError:
-            _send_msg('Document not found in library.')
-            return
-        except UnsupportedEntryTypeError:
-            _send_msg('Only functions using DOIs are supported at this time.')
-            return
-
-        # Add entry to history
-        self.doc_selector.add_to_history(value)
-
-        self.update_document_status(doi=value)
+        _trash_document(self, entry_type, value)
 
     def follow_refs_forward(self):
         doi = self.doc_selector.value
-        things = db.follow_refs_forward(doi)
 
+        # The database query runs on the database thread and the
+        # results are shown once it returns
+        _run_in_db_thread(_follow_refs_forward, doi,
+                          on_result=lambda things: self._show_forward_refs(doi, things))
+
+    def _show_forward_refs(self, doi, things):
         # First clean up existing GUI window.
         # If there are widgets in the layout (i.e. from the last call to 'get_refs'),
         # delete all of those reference labels before adding more.
-        _delete_all_widgets(self.ref_items_layout)
+        self._clear_ref_labels()
 
-        for thing in things:
-            ref_label = self.ref_to_label(thing)
-            self.ref_items_layout.insertWidget(self.ref_area_layout.count() - 1, ref_label)
+        _add_widgets(self.ref_items_layout, [self.ref_to_label(thing) for thing in things])
+        self.lookup_ref_statuses()
 
         # Add entry to history
         self.doc_selector.add_to_history(doi)
@@ -346,34 +382,47 @@ class EntryWindow(QWidget):
             return
 
         if self.data.doc_response_json is not None:
-            doc = self.data.doc_response_json
-        else:
-            doc = self.library.get_document(doi=doi, return_json=True)
+            self._start_ref_entry(doi, self.data.doc_response_json)
+            return
+
+        # The library can be busy with an add or a sync, so the document
+        # is looked up on a worker
+        worker = Worker(self.library.get_document, doi=doi, return_json=True)
+        worker.signals.result.connect(lambda doc: self._start_ref_entry(doi, doc))
+        worker.signals.error.connect(lambda exc: _send_msg(str(exc)))
+        QThreadPool.globalInstance().start(worker)
+
+    def _start_ref_entry(self, doi, doc):
         doc_id = doc.get('id')
 
         # If there is a file attached to the user's document, offer the option to open the file.
-        if self.doc_selector.status == 2:
+        if self.doc_selector.status == DocStatus.IN_LIB_WITH_FILE:
             reply = QMessageBox.question(self, 'Message', 'A file has been found for this document.\n'
                   'Would you like to open it for reference?', QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
 
             if reply == QMessageBox.Yes:
-                # Get the content and name of the attached pdf
-                try:
-                    file_content, _, file_id = self.library.get_file_content_from_doc_id(doc_id=doc_id)
-                except Exception as exc:
-                    _send_msg('File retrieval from Mendeley failed.')
-                    return
+                # Get the content and name of the attached pdf. The API call
+                # is paced by the rate limiter, so it runs on a worker.
+                worker = Worker(self.library.get_file_content_from_doc_id, doc_id=doc_id)
+                worker.signals.result.connect(lambda result: self._open_ref_entry(doi, result[0]))
+                worker.signals.error.connect(lambda exc: _send_msg('File retrieval from Mendeley failed.'))
+                QThreadPool.globalInstance().start(worker)
+                return
 
-                # Get the directory of the current running script to use for temp storage
-                package_path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
-                temp_filename = os.path.join(package_path, 'temp.pdf')
+        self._open_ref_entry(doi)
 
-                # Write contents of pdf from user library to a temporary file.
-                with open(temp_filename, 'wb') as temp_file:
-                    temp_file.write(file_content)
+    def _open_ref_entry(self, doi, file_content=None):
+        if file_content is not None:
+            # Get the directory of the current running script to use for temp storage
+            package_path = os.path.dirname(os.path.abspath(__file__))
+            temp_filename = os.path.join(package_path, 'temp.pdf')
 
-                # Open the temp file for viewing
-                _open_file(filename=temp_filename)
+            # Write contents of pdf from user library to a temporary file.
+            with open(temp_filename, 'wb') as temp_file:
+                temp_file.write(file_content)
+
+            # Open the temp file for viewing
+            _open_file(filename=temp_filename)
 
         ref_window = ReferenceEntryWindow(main_paper_doi=doi, library=self.library)
         ref_window.show()
@@ -386,15 +435,14 @@ class EntryWindow(QWidget):
         # The ref_items_layout would hold the ref_labels.
         # If count is 0, none are listed, and it needs to be populated.
         if self.ref_items_layout.count() == 1:
-            self.get_refs()
+            self.get_refs(on_done=self.add_all_refs)
+            return
 
         main_doi = self.doc_selector.value
         self.response_label.show()
 
         self.fModel.add_all_refs(main_doi=main_doi, ref_labels=self.ref_items_layout)
 
-        self.response_label.hide()
-
     def get_all_dois(self):
         """
         Attempts to retrieve DOIs corresponding to each reference.
@@ -402,70 +450,100 @@ class EntryWindow(QWidget):
         # The ref_items_layout would hold the ref_labels.
         # If count is 0, none are listed, and it needs to be populated.
         if self.ref_items_layout.count() == 1:
-            self.get_refs()
+            self.get_refs(on_done=self.get_all_dois)
+            return
 
-        self.response_label.show()
+        labels = [label for label in _layout_widgets(self.ref_items_layout) if label.doi is None]
+
+        if not labels:
+            return
+
+        # References that read the same are looked up once and the result
+        # is given to all of them
+        groups = OrderedDict()
+        for label in labels:
+            lookup = _citation_lookup(label.expanded_text)
+            groups.setdefault(_normalize_citation(lookup), (lookup, []))[1].append(label)
 
         citing_doi = self.doc_selector.value
+        generation = self._ref_generation
+        total = remaining = len(groups)
+        progress_scheduled = False
+
+        self.response_label.setText('Finding DOIs for %d references...' % total)
+        self.response_label.show()
+
+        def found(group, result):
+            # Skip labels that were cleared while the lookup was running
+            if generation == self._ref_generation:
+                for label in group:
+                    self._apply_found_doi(label, citing_doi, *result)
+
+        def show_progress():
+            nonlocal progress_scheduled
+            progress_scheduled = False
+            if remaining and generation == self._ref_generation:
+                self.response_label.setText('Finding DOIs: %d of %d done' % (total - remaining, total))
+
+        def finished():
+            nonlocal remaining, progress_scheduled
+            remaining -= 1
+            if remaining == 0:
+                if generation == self._ref_generation:
+                    self.response_label.hide()
+                # Write the database changes for every DOI found in one go
+                _flush_reference_updates()
+                _start_sync(self.library)
+            elif not progress_scheduled:
+                # Update the progress text at most every 100 ms, however
+                # quickly the lookups finish
+                progress_scheduled = True
+                QTimer.singleShot(100, show_progress)
+
+        # Each citation is resolved on its own worker
+        for lookup, group in groups.values():
+            worker = Worker(_doi_and_title_from_citation, lookup)
+            worker.signals.result.connect(lambda result, group=group: found(group, result))
+            worker.signals.finished.connect(finished)
+            _citation_pool.start(worker)
+
+    def _apply_found_doi(self, label, citing_doi, doi, retrieved_title):
+        """
+        Updates a reference label with the DOI found for it by get_all_dois.
+        Runs on the main thread. The change to the label's database entry
+        is queued, to be written along with the others.
+        """
+        ref = label.reference
+        authors = ref.get('authors')
+        date = ref.get('year')
+        if date is None:
+            date = ref.get('date')
 
-        for x in range(1, self.ref_items_layout.count()):
-            label = self.ref_items_layout.itemAt(x).widget()
-
-            if label.doi is not None:
-                continue
-
-            self.response_label.setText('Finding DOI for: ' + label.small_text)
-            self.response_label.repaint()
-            qApp.processEvents()
-
-            authors = label.reference.get('authors')
-            date = label.reference.get('year')
-            if date is None:
-                date = label.reference.get('date')
-
-            lookup = label.expanded_text
-            lookup = lookup.replace('\n', ' ')
-            doi, retrieved_title = rr.doi_and_title_from_citation(lookup)
-            if doi is not None and '10.' in doi:
-                label.doi = doi
-                title = label.reference.get('title')
-
-                # This is if there is no title in a given reference
-                if title is None:
-                    title = retrieved_title
-                    label.reference.title = title
-                    if title is not None:
-                        if len(title) > 60:
-                            short_title = title[0:60]
-                        else:
-                            short_title = title
-                        label.small_text = label.small_text + short_title
-                        label.expanded_text = label.expanded_text + '\n' + title
-
-                label.expanded_text = label.expanded_text + '\n' + doi
-
-                # TODO: move database interaction out of the window class
-                if authors is not None:
-                    # Update the reference entry within the database to
-                    # reflect the change.
-                    db.update_reference_field(identifying_value=date, updating_field=['doi', 'title'],
-                                            updating_value=[doi, title], citing_doi=citing_doi,
-                                            authors=authors, filter_by_authors=True)
-                elif title is not None:
-                    # Update the reference entry within the database to
-                    # reflect the change.
-                    db.update_reference_field(identifying_value=title, updating_field=['doi', 'title'],
-                                        updating_value=[doi, title], filter_by_title=True)
-            label.update_status(doi=doi, popups=False, sync=False)
+        if is_valid_doi(doi):
+            label.doi = doi
+            title = ref.get('title')
 
-        self.response_label.hide()
-        self.library.sync()
+            # This is if there is no title in a given reference
+            if title is None:
+                title = retrieved_title
+                if title is not None:
+                    label.small_text = label.small_text + title[:60]
+                    label.add_expanded_line(title)
+
+            label.add_expanded_line(doi)
+            ref.update({'doi': doi, 'title': title})
+            _forget_reference_texts(citing_doi)
+
+            # TODO: move database interaction out of the window class
+            # Update the reference entry within the database to reflect the change.
+            _queue_doi_update(citing_doi, doi, title, authors, date)
+        label.update_status(doi=doi, popups=False, sync=False)
 
 
     # ++++++++++++++++++++++++++++++++++++++++++++
     # ============================================ Reference Label Functions
     # ++++++++++++++++++++++++++++++++++++++++++++
-    def ref_to_label(self, ref):
+    def ref_to_label(self, ref, texts=None, owner=None):
         """
         Creates a ReferenceLabel object from a single paper reference.
         Formats title, author information for display, connects functionality
@@ -476,87 +554,125 @@ class EntryWindow(QWidget):
         ----------
         ref: dict
             Contains information from a single paper reference.
+        texts: tuple
+            The reference's (small_text, expanded_text) from _reference_texts(),
+            if they were already made on the worker thread.
+        owner: QWidget
+            The window whose reference area shows the label, if not this one.
+            Its library lookup is queued with that window's labels.
 
         Returns
         -------
         ref_label: ReferenceLabel
             For display in reference box.
         """
-        # Extract main display info
-        ref_id = ref.get('ref_id')
-        ref_title = ref.get('title')
-        ref_author_list = ref.get('authors')
+        if owner is None:
+            owner = self
         ref_doi = ref.get('doi')
-        ref_year = ref.get('year')
-        if ref_year is None:
-            ref_year = ref.get('date')
-
-        if isinstance(ref_author_list, str):
-            ref_author_list = ref_author_list.split('; ')
-
-        # Format short and long author lists
-        if ref_author_list is not None:
-            ref_full_authors = '; '.join(ref_author_list)
-            if len(ref_author_list) > 2:
-                ref_first_authors = ref_author_list[0] + ', ' + ref_author_list[1] + ', et al.'
-            else:
-                ref_first_authors = ref_full_authors
-        else:
-            ref_first_authors = ''
-            ref_full_authors = ''
-
-        # Initialize indicator about whether reference is in library
-        in_lib = 3
-
-        # Build up strings with existing info
-        # Small text is for abbreviated preview.
-        # Expanded text is additional information for the larger
-        # reference view when a label is clicked.
-        ref_small_text = ''
-        ref_expanded_text = ''
-        if ref_id is not None:
-            ref_small_text = ref_small_text + str(ref_id) + '. '
-            ref_expanded_text = ref_expanded_text + str(ref_id) + '. '
-        if ref_author_list is not None:
-            ref_small_text = ref_small_text + ref_first_authors
-            ref_expanded_text = ref_expanded_text + ref_full_authors
-        if ref.get('publication') is not None:
-            ref_expanded_text = ref_expanded_text + '\n' + ref.get('publication')
-        if ref_year is not None:
-            ref_small_text = ref_small_text + ', ' + ref_year
-            ref_expanded_text = ref_expanded_text + ', ' + ref_year
-        if ref_title is not None:
-            ref_small_text = ref_small_text + ', ' + ref_title
-            ref_expanded_text = ref_expanded_text + '\n' + ref_title
-        if ref_doi is not None:
-            ref_expanded_text = ref_expanded_text + '\n' + ref_doi
-            try:
-                doc_json = self.library.get_document(ref_doi, return_json=True)
-                has_file = doc_json.get('file_attached')
-                if has_file:
-                    in_lib = 2
-                else:
-                    in_lib = 1
-            except Exception:
-                in_lib = 0
 
-        # Cut off length of small text to fit within window
-        ref_small_text = td(ref_small_text, 66)
+        # Initialize indicator about whether reference is in library.
+        # Labels with a DOI are updated once the library lookup started
+        # below comes back.
+        in_lib = DocStatus.UNKNOWN
+
+        if texts is None:
+            texts = _reference_texts(ref)
+        ref_small_text, ref_expanded_text = texts
 
         # Make ReferenceLabel object and set attributes
         ref_label = ReferenceLabel(ref_small_text, self)
         ref_label.small_text = ref_small_text
         ref_label.expanded_text = ref_expanded_text
         ref_label.reference = ref
-        ref_label.doi = ref.get('doi')
-        ref_label.status = in_lib
+        ref_label.doi = ref_doi
+
+        # Only the view is set here. Setting the label status would also
+        # record the still unknown status in the database.
+        ref_label.view.status = in_lib
 
         # Append all labels to reference text lists in in Data()
         self.data.small_ref_labels.append(ref_small_text)
         self.data.expanded_ref_labels.append(ref_expanded_text)
 
+        # The library status is filled in by lookup_ref_statuses(). A
+        # malformed DOI can't be in the library, so it isn't looked up.
+        if ref_doi is not None and not is_valid_doi(ref_doi):
+            ref_label.status = DocStatus.MISSING
+        elif ref_doi is not None:
+            labels = owner._pending_labels.setdefault(ref_doi, [])
+            labels.append(ref_label)
+            if len(labels) == 1:
+                owner._queued_dois.append(ref_doi)
+
         return ref_label
 
+    def lookup_ref_statuses(self, owner=None):
+        """
+        Looks up whether the papers for all reference labels made since the
+        last call are in the library. The lookups run together as one batch
+        on a worker thread, so building the reference list doesn't wait on
+        the library. The labels are colored when the batch comes back.
+
+        Parameters
+        ----------
+        owner : QWidget
+            The window the labels were made for with ref_to_label(), if
+            not this one.
+        """
+        if owner is None:
+            owner = self
+        dois = owner._queued_dois
+        if not dois:
+            return
+        owner._queued_dois = []
+
+        worker = Worker(self.library.get_documents, dois)
+        worker.signals.result.connect(lambda docs: self._set_ref_statuses(docs, owner))
+        worker.signals.error.connect(lambda exc: self._set_ref_statuses(dict.fromkeys(dois), owner))
+        QThreadPool.globalInstance().start(worker)
+
+    def apply_lib_status(self, label, doc_json):
+        """
+        Colors a reference label according to its library entry.
+
+        Parameters
+        ----------
+        label : ReferenceLabel
+            The label to update.
+        doc_json : dict
+            Library entry for the label's DOI, or None if it was not found.
+        """
+        if doc_json is None:
+            label.status = DocStatus.MISSING
+        elif doc_json.get('file_attached'):
+            label.status = DocStatus.IN_LIB_WITH_FILE
+        else:
+            label.status = DocStatus.IN_LIB_NO_FILE
+
+    def _set_ref_statuses(self, docs, owner):
+        # Runs on the main thread with the results of lookup_ref_statuses()
+        container = owner.ref_items_layout.parentWidget()
+        container.setUpdatesEnabled(False)
+        try:
+            for doi, doc_json in docs.items():
+                for label in owner._pending_labels.pop(doi, ()):
+                    if label.removed:
+                        continue
+                    self.apply_lib_status(label, doc_json)
+        finally:
+            container.setUpdatesEnabled(True)
+
+    def _clear_ref_labels(self):
+        """
+        Deletes all of the reference labels in the reference area. Lookups
+        still running for them are forgotten so their results aren't
+        applied to deleted labels.
+        """
+        self._pending_labels.clear()
+        self._queued_dois = []
+        self._ref_generation += 1
+        _delete_all_widgets(self.ref_items_layout)
+
 
     # ++++++++++++++++++++++++++++++++++++++++++++
     # ============================================ Notes Box Display Functions
@@ -567,17 +683,26 @@ class EntryWindow(QWidget):
         the main text box.
         """
         # Paper must be in the library to display the window
-        if self.doc_selector.status == 0:
+        if self.doc_selector.status == DocStatus.MISSING:
             _send_msg('Document not found in library.')
             return
         doc_json = self.data.doc_response_json
         if doc_json is None:
             if self.doc_selector.entry_type == 'doi':
+                # Looked up on a worker, since the library can be busy
+                # with an add or a sync
                 doi = self.doc_selector.value
-                doc_json = self.library.get_document(doi=doi, return_json=True)
+                worker = Worker(self.library.get_document, doi=doi, return_json=True)
+                worker.signals.result.connect(self._open_main_notes)
+                worker.signals.error.connect(lambda exc: _send_msg(str(exc)))
+                QThreadPool.globalInstance().start(worker)
+                return
             else:
                 raise LookupError('Need DOI to open notes box.')
 
+        self._open_main_notes(doc_json)
+
+    def _open_main_notes(self, doc_json):
         if doc_json is None:
             raise LookupError('Main document information not found')
 
@@ -612,29 +737,48 @@ class EntryWindow(QWidget):
         adding : bool
             Indicates whether a paper is being added or deleted.
         """
-        if sync:
-            self.library.sync()
-
         if doi is None:
             doi = self.doc_selector.value
             if doi is None:
                 return
 
-        try:
-            doc_json = self.library.get_document(doi, return_json=True)
-        except DocNotFoundError:
+        # Sync on the sync thread, then come back to check the document
+        if sync:
+            _start_sync(self.library, lambda: self.update_document_status(doi, adding, popups, sync=False))
+            return
+
+        # The lookup runs on a worker. Only the latest request is answered,
+        # so a slow lookup can't overwrite a newer status.
+        self._status_request += 1
+        request = self._status_request
+
+        def found(doc_json):
+            if request == self._status_request:
+                self._show_document_status(doi, adding, popups, doc_json)
+
+        def failed(exc):
+            if request == self._status_request:
+                self._show_document_status(doi, adding, popups, None, exc)
+
+        worker = Worker(self.library.get_document, doi, return_json=True)
+        worker.signals.result.connect(found)
+        worker.signals.error.connect(failed)
+        QThreadPool.globalInstance().start(worker)
+
+    def _show_document_status(self, doi, adding, popups, doc_json, exc=None):
+        if isinstance(exc, DocNotFoundError):
             # Document was not found in library
             if adding:
                 if popups:
                     _send_msg('Document not in library.')
             self.data.doc_response_json = None
-            self.doc_selector.status = 0
-        except Exception:
+            self.doc_selector.status = DocStatus.MISSING
+        elif exc is not None:
             if adding:
                 if popups:
                     _send_msg('An error occurred during sync.\nDocument may not have been added.')
             self.data.doc_response_json = None
-            self.doc_selector.status = 0
+            self.doc_selector.status = DocStatus.MISSING
         else:
             has_file = doc_json.get('file_attached')
             if has_file is not None:
@@ -657,17 +801,17 @@ class EntryWindow(QWidget):
                         if reply != QMessageBox.Accepted:
                             # 1 = document in library without attached file
                             self.data.doc_response_json = doc_json
-                            self.doc_selector.status = 1
+                            self.doc_selector.status = DocStatus.IN_LIB_NO_FILE
                             return
                     else:
                         # 2 = document in library with attached file
                         self.data.doc_response_json = doc_json
-                        self.doc_selector.status = 2
+                        self.doc_selector.status = DocStatus.IN_LIB_WITH_FILE
                 else:
                     if has_file:
-                        self.doc_selector.status = 2
+                        self.doc_selector.status = DocStatus.IN_LIB_WITH_FILE
                     else:
-                        self.doc_selector.status = 1
+                        self.doc_selector.status = DocStatus.IN_LIB_NO_FILE
 
 
     # ++++++++++++++++++++++++++++++++++++++++++++
@@ -692,10 +836,9 @@ class EntryWindow(QWidget):
             entered_doi = self.doc_selector.value
         else: entered_doi = doi
 
-        if entered_doi == '':
+        if not is_valid_doi(entered_doi):
             return False
-        in_library = self.library.check_for_document(entered_doi)
-        return in_library
+        return self.library.contains_doi(entered_doi)
 
     def _set_response_message(self, message):
         """
@@ -758,9 +901,20 @@ class InternalSearchWindow(QWidget):
         self.fModel = FunctionModel(self)
         self.data = Data()
 
+        # Incremented by each update_document_status() lookup so only the
+        # latest is shown
+        self._status_request = 0
+
+        # Reference labels waiting on a library lookup, keyed by DOI, and
+        # the DOIs that haven't been sent off for lookup yet. The labels are
+        # made by the main window, but the lookups are kept here so each
+        # window only forgets its own.
+        self._pending_labels = {}
+        self._queued_dois = []
+
         # Connect copy to clipboard shortcut
-        self.copy_shortcut = QShortcut(QKeySequence("Ctrl+C"), self)
-        self.copy_shortcut.activated.connect(_copy_to_clipboard)
+        self.copy_shortcut = QShortcut(QKeySequence.Copy, self)
+        self.copy_shortcut.activated.connect(_copy_selection)
 
         self.parent_tab_window = parent_tab_window
         self.sibling_window = sibling_window
@@ -867,10 +1021,6 @@ class InternalSearchWindow(QWidget):
         # Set layout to be the vertical box.
         self.setLayout(self.vbox)
 
-        # Connect copy to clipboard shortcut
-        self.copy_shortcut = QShortcut(QKeySequence("Ctrl+C"), self)
-        self.copy_shortcut.activated.connect(_copy_to_clipboard)
-
 
     # +=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+= Start of Functions
 
@@ -897,8 +1047,9 @@ class InternalSearchWindow(QWidget):
             return
 
         # Resolve DOI and get references
-        refs = self.fModel.retrieve_only_refs(doi=entered_doi)
+        self.fModel.request_refs(entered_doi, lambda refs, texts: self._show_refs(entered_doi, refs, texts))
 
+    def _show_refs(self, entered_doi, refs, texts):
         if refs is None or len(refs) == 0:
             _send_msg('No references found.')
             return
@@ -906,11 +1057,11 @@ class InternalSearchWindow(QWidget):
         # First clean up existing GUI window.
         # If there are widgets in the layout (i.e. from the last call to 'get_refs'),
         # delete all of those reference labels before adding more.
-        _delete_all_widgets(self.ref_items_layout)
+        self._clear_ref_labels()
 
-        for ref in refs:
-            ref_label = self.ref_to_label(ref)
-            self.ref_items_layout.insertWidget(self.ref_area_layout.count() - 1, ref_label)
+        _add_widgets(self.ref_items_layout, [self.main_window.ref_to_label(ref, text, owner=self)
+                                             for ref, text in zip(refs, texts)])
+        self.main_window.lookup_ref_statuses(owner=self)
 
         # Add entry to history
         self.doc_selector.add_to_history(entered_doi)
@@ -927,7 +1078,7 @@ class InternalSearchWindow(QWidget):
         Adds paper corresponding to the DOI in the text field to the user library,
         if it is not already there.
         """
-        if self.doc_selector.status in (1,2):
+        if self.doc_selector.status in _IN_LIB:
             _send_msg('Paper is already in library.')
             return
 
@@ -936,29 +1087,8 @@ class InternalSearchWindow(QWidget):
             self._set_response_message('Please enter text above.')
             return
 
-        try:
-            self.library.add_to_library(doi)
-        except UnsupportedPublisherError as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_main', message='Unsupported publisher', error=str(exc), doi=doi)
-            _send_msg('Publisher is not yet supported.\nDocument not added.')
-            return
-        except CallFailedException as call:
-            error_logging.log(method='gui.Window.add_to_library_from_main', message='Call failed', error=str(call), doi=doi)
-            _send_msg(str(call))
-        except ParseException or AttributeError as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_main', message='Error while parsing article webpage',
-                error=str(exc), doi=doi)
-            _send_msg('Error while parsing article webpage.')
-        except PDFError:
-            _send_msg('PDF could not be retrieved.')
-        except Exception as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_main', error=str(exc), doi=doi)
-            _send_msg(str(exc))
-
-        # Add entry to history
-        self.doc_selector.add_to_history(doi)
-
-        self.update_document_status(doi, adding=True)
+        self._set_response_message('Adding to library...')
+        _add_to_library(self, doi)
 
     def move_to_trash(self, doi=None):
         """
@@ -981,32 +1111,24 @@ class InternalSearchWindow(QWidget):
             entry_type = self.doc_selector.entry_type
             value = self.doc_selector.value
 
-        try:
-            self.library.trash_document(**{entry_type: value})
-        except DocNotFoundError:
-            _send_msg('Document not found in library.')
-            return
-        except UnsupportedEntryTypeError:
-            _send_msg('Only functions using DOIs are supported at this time.')
-            return
-
-        # Add entry to history
-        self.doc_selector.add_to_history(value)
-
-        self.update_document_status(doi=value)
+        _trash_document(self, entry_type, value)
 
     def follow_refs_forward(self):
         doi = self.doc_selector.value
-        things = db.follow_refs_forward(doi)
 
+        # The database query runs on the database thread and the
+        # results are shown once it returns
+        _run_in_db_thread(_follow_refs_forward, doi,
+                          on_result=lambda things: self._show_forward_refs(doi, things))
+
+    def _show_forward_refs(self, doi, things):
         # First clean up existing GUI window.
         # If there are widgets in the layout (i.e. from the last call to 'get_refs'),
         # delete all of those reference labels before adding more.
-        _delete_all_widgets(self.ref_items_layout)
+        self._clear_ref_labels()
 
-        for thing in things:
-            ref_label = self.ref_to_label(thing)
-            self.ref_items_layout.insertWidget(self.ref_area_layout.count() - 1, ref_label)
+        _add_widgets(self.ref_items_layout, [self.main_window.ref_to_label(thing, owner=self) for thing in things])
+        self.main_window.lookup_ref_statuses(owner=self)
 
         # Add entry to history
         self.doc_selector.add_to_history(doi)
@@ -1040,8 +1162,9 @@ class InternalSearchWindow(QWidget):
                 del sd_copy[k]
 
         search_dict = sd_copy
-        results = db.check_multiple_constraints(search_dict)
+        _run_in_db_thread(db.check_multiple_constraints, search_dict, on_result=self._show_results)
 
+    def _show_results(self, results):
         if results is None or len(results) == 0:
             _send_msg('No matching entries found.')
             return
@@ -1049,16 +1172,25 @@ class InternalSearchWindow(QWidget):
         # First clean up existing GUI window.
         # If there are widgets in the layout (i.e. from the last call to 'get_refs'),
         # delete all of those reference labels before adding more.
-        _delete_all_widgets(self.ref_items_layout)
+        self._clear_ref_labels()
 
         for result in results:
-            # ref_label = self.ref_to_label(result)
-            ref_label = self.main_window.ref_to_label(result)
+            ref_label = self.main_window.ref_to_label(result, owner=self)
             self.ref_items_layout.insertWidget(0, ref_label)
+        self.main_window.lookup_ref_statuses(owner=self)
 
         self.response_label.hide()
         self.ref_area.show()
 
+    def _clear_ref_labels(self):
+        """
+        Deletes all of the reference labels in the reference area, and
+        forgets the lookups still running for them.
+        """
+        self._pending_labels.clear()
+        self._queued_dois = []
+        _delete_all_widgets(self.ref_items_layout)
+
 
     # ++++++++++++++++++++++++++++++++++++++++++++
     # ============================================ Notes Box Display Functions
@@ -1069,7 +1201,7 @@ class InternalSearchWindow(QWidget):
         the main text box.
         """
         # Paper must be in the library to display the window
-        if self.doc_selector.status == 0:
+        if self.doc_selector.status == DocStatus.MISSING:
             _send_msg('Document not found in library.')
             return
         doc_json = self.data.doc_response_json
@@ -1103,29 +1235,48 @@ class InternalSearchWindow(QWidget):
         adding : bool
             Indicates whether a paper is being added or deleted.
         """
-        if sync:
-            self.library.sync()
-
         if doi is None:
             doi = self.doc_selector.value
             if doi is None:
                 return
 
-        try:
-            doc_json = self.library.get_document(doi, return_json=True)
-        except DocNotFoundError:
+        # Sync on the sync thread, then come back to check the document
+        if sync:
+            _start_sync(self.library, lambda: self.update_document_status(doi, adding, popups, sync=False))
+            return
+
+        # The lookup runs on a worker. Only the latest request is answered,
+        # so a slow lookup can't overwrite a newer status.
+        self._status_request += 1
+        request = self._status_request
+
+        def found(doc_json):
+            if request == self._status_request:
+                self._show_document_status(doi, adding, popups, doc_json)
+
+        def failed(exc):
+            if request == self._status_request:
+                self._show_document_status(doi, adding, popups, None, exc)
+
+        worker = Worker(self.library.get_document, doi, return_json=True)
+        worker.signals.result.connect(found)
+        worker.signals.error.connect(failed)
+        QThreadPool.globalInstance().start(worker)
+
+    def _show_document_status(self, doi, adding, popups, doc_json, exc=None):
+        if isinstance(exc, DocNotFoundError):
             # Document was not found in library
             if adding:
                 if popups:
                     _send_msg('Document not in library.')
             self.data.doc_response_json = None
-            self.doc_selector.status = 0
-        except Exception:
+            self.doc_selector.status = DocStatus.MISSING
+        elif exc is not None:
             if adding:
                 if popups:
                     _send_msg('An error occurred during sync.\nDocument may not have been added.')
             self.data.doc_response_json = None
-            self.doc_selector.status = 0
+            self.doc_selector.status = DocStatus.MISSING
         else:
             has_file = doc_json.get('file_attached')
             if has_file is not None:
@@ -1147,12 +1298,12 @@ class InternalSearchWindow(QWidget):
                     if reply != QMessageBox.Accepted:
                         # 1 = document in library without attached file
                         self.data.doc_response_json = doc_json
-                        self.doc_selector.status = 1
+                        self.doc_selector.status = DocStatus.IN_LIB_NO_FILE
                         return
                 else:
                     # 2 = document in library with attached file
                     self.data.doc_response_json = doc_json
-                    self.doc_selector.status = 2
+                    self.doc_selector.status = DocStatus.IN_LIB_WITH_FILE
 
 
     # ++++++++++++++++++++++++++++++++++++++++++++
@@ -1177,10 +1328,9 @@ class InternalSearchWindow(QWidget):
             entered_doi = self.doc_selector.value
         else: entered_doi = doi
 
-        if entered_doi == '':
+        if not is_valid_doi(entered_doi):
             return False
-        in_library = self.library.check_for_document(entered_doi)
-        return in_library
+        return self.library.contains_doi(entered_doi)
 
     def _set_response_message(self, message):
         """
@@ -1277,13 +1427,11 @@ class TabbedNotesWindow(QTabWidget):
         self.addTab(self.abstract_tab, 'Abstract')
         self.addTab(self.info_tab, 'Info')
         self.notesUI()
-        self.abstractUI()
-        self.infoUI()
-
-        if self.notes is not None:
-            self.notes_box.setText(self.notes)
 
-        self.saved = True
+        # Only the notes tab is shown at first. The other tabs are filled
+        # in the first time they are opened.
+        self._tab_builders = {1: self.abstractUI, 2: self.infoUI}
+        self.currentChanged.connect(self._build_tab)
 
         self.show()
 
@@ -1293,7 +1441,7 @@ class TabbedNotesWindow(QTabWidget):
         self.saving_status = QStackedWidget()
         self.saving_label = QLabel('Saving...')
         self.saved_label = QLabel('Saved!')
-        self.notes_box = QTextEdit()
+        self.notes_box = QPlainTextEdit()
         self.save_button = QPushButton('Save')
         self.save_and_close_button = QPushButton('Save and Close')
 
@@ -1305,12 +1453,12 @@ class TabbedNotesWindow(QTabWidget):
         self.saving_status.hide()
 
         # Connect widgets
-        self.save_button.clicked.connect(self.save)
+        self.save_button.clicked.connect(lambda: self.save())
         self.save_and_close_button.clicked.connect(self.save_and_close)
         self.notes_box.textChanged.connect(self.updated_text)
 
         if self.notes is not None:
-            self.notes_box.setText(self.notes)
+            self.notes_box.setPlainText(self.notes)
 
         self.saved = True
 
@@ -1333,6 +1481,11 @@ class TabbedNotesWindow(QTabWidget):
 
         self.notes_tab.setLayout(vbox)
 
+    def _build_tab(self, index):
+        builder = self._tab_builders.pop(index, None)
+        if builder is not None:
+            builder()
+
     def abstractUI(self):
         abstract = self.doc_json.get('abstract')
 
@@ -1351,32 +1504,37 @@ class TabbedNotesWindow(QTabWidget):
         # list of things to include:
         # publisher, authors, year, doi, title, identifiers(?), pages, volume
 
-        info = ''
-        if self.doc_json.get('title') is not None:
-            info = info + 'Title: ' + self.doc_json.get('title') + '\n'
-        author_list = self.doc_json.get('authors')
+        get = self.doc_json.get
+        parts = []
+
+        title = get('title')
+        if title is not None:
+            parts.append('Title: ' + title + '\n')
+        author_list = get('authors')
         authors = ''
         if author_list is not None:
-            for author in author_list:
-                authors = authors + author['first_name'] + ' ' + author['last_name'] + ', '
-            authors = authors[:-2] # Get rid of trailing comma
-        info = info + 'Authors: ' + authors + '\n'
-        if self.doc_json.get('publisher') is not None:
-            info = info + 'Publisher: ' + self.doc_json.get('publisher') + ','
-        if self.doc_json.get('year') is not None:
-            info = info + str(self.doc_json.get('year')) + '\n'
-        if self.doc_json.get('volume') is not None:
-            info = info + 'Volume: ' + self.doc_json.get('volume').strip() + ', '
-        if self.doc_json.get('issue') is not None:
-            info = info + 'Issue: ' + self.doc_json.get('issue') + '\n'
-        if self.doc_json.get('pages') is not None:
-            info = info + 'Pages: ' + self.doc_json.get('pages') + '\n'
-        ids = self.doc_json.get('identifiers')
+            authors = ', '.join(f"{author['first_name']} {author['last_name']}" for author in author_list)
+        parts.append('Authors: ' + authors + '\n')
+        publisher = get('publisher')
+        if publisher is not None:
+            parts.append('Publisher: ' + publisher + ',')
+        year = get('year')
+        if year is not None:
+            parts.append(str(year) + '\n')
+        volume = get('volume')
+        if volume is not None:
+            parts.append('Volume: ' + volume.strip() + ', ')
+        issue = get('issue')
+        if issue is not None:
+            parts.append('Issue: ' + issue + '\n')
+        pages = get('pages')
+        if pages is not None:
+            parts.append('Pages: ' + pages + '\n')
+        ids = get('identifiers')
         if ids is not None:
-            info = info + 'Identifiers: '
-            for key in ids.keys():
-                info = info + key.upper() + ': ' + ids.get(key) + ', '
-            info = info[:-2] # Get rid of trailing comma
+            parts.append('Identifiers: ' + ', '.join(f'{key.upper()}: {value}' for key, value in ids.items()))
+
+        info = ''.join(parts)
 
         info_label = QLabel(info)
         info_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
@@ -1400,23 +1558,19 @@ class TabbedNotesWindow(QTabWidget):
             doc_authors = doc_json.get('authors')
             if doc_authors is not None:
                 lastnames = [a.get('last_name') for a in doc_authors]
-                first_authors = lastnames[0:2]
-                first_authors = ', '.join(first_authors)
-                if len(lastnames) > 2:
-                    first_authors = first_authors + ', et al.'
+                suffix = ', et al.' if len(lastnames) > 2 else ''
+                first_authors = ', '.join(lastnames[:2]) + suffix
             else:
                 first_authors = ''
 
-        self.caption = ''
-
         if doc_year is not None and doc_authors is not None:
-            self.caption = first_authors + ' (' + str(doc_year) + ')'
+            self.caption = f'{first_authors} ({doc_year})'
         elif doc_title is not None:
             self.caption = doc_title
         else:
             self.caption = self.doi
 
-    def save(self):
+    def save(self, close=False):
         # Change label to indicate saving
         self.saving_status.setCurrentIndex(0)
         self.saving_status.show()
@@ -1426,23 +1580,46 @@ class TabbedNotesWindow(QTabWidget):
         updated_notes = self.notes_box.toPlainText()
         notes_dict = {"notes" : updated_notes}
 
-        # Update the Mendeley document with the new notes and sync with library
-        self.parent.library.update_document(doc_id=self.doc_id, notes=notes_dict)
-        self.parent.library.sync()
+        # Update the Mendeley document with the new notes on a worker thread.
+        # The notes only count as saved, and the window is only closed, once
+        # Mendeley has them.
+        worker = Worker(self.parent.library.update_document, doc_id=self.doc_id, notes=notes_dict)
+        worker.signals.result.connect(lambda _: self._notes_updated(updated_notes, close))
+        worker.signals.error.connect(self._save_failed)
+        QThreadPool.globalInstance().start(worker)
+
+    def _notes_updated(self, updated_notes, close=False):
+        # Notes edited while the save was running still need saving
+        if self.notes_box.toPlainText() == updated_notes:
+            self.saved = True
 
-        # Update local version of notes to updated version and indicate saved
+        # Update local version of notes to updated version
         if self.label is None:
             self.parent.data.doc_response_json['notes'] = updated_notes
-        self.saved = True
 
+        # The notes are saved once Mendeley has them. Syncing the local
+        # library with them doesn't need to hold up the indicator.
+        self._show_saved()
+        _start_sync(self.parent.library)
+
+        if close:
+            self.close()
+
+    def _show_saved(self):
         # Change label to indicate saved
         self.saving_status.setCurrentIndex(1)
         self.saving_status.show()
         QTimer.singleShot(2000, self.saving_status.hide)
 
+    def _save_failed(self, exc):
+        error_logging.log(method='gui.TabbedNotesWindow.save', message='Error saving notes', error=str(exc),
+                          doi=self.doi)
+        self.saved = False
+        self.saving_status.hide()
+        _send_msg('Notes could not be saved.')
+
     def save_and_close(self):
-        self.save()
-        self.close()
+        self.save(close=True)
 
     def updated_text(self):
         self.saved = False
@@ -1465,45 +1642,53 @@ class DocSelectorView(object):
 
     # - text entry
     # - type selectors
-    
+
+    # Indicator color for each status: green if the document is in the
+    # library with a file attached, orange if it has no file, red if it
+    # isn't in the library, grey before anything is looked up. The style
+    # sheet is set once and picks the color from the indicator's docStatus
+    # property, so a status change doesn't set a new style sheet.
+    STATUSES = (DocStatus.MISSING, DocStatus.IN_LIB_NO_FILE, DocStatus.IN_LIB_WITH_FILE)
+    STYLE_SHEET = """
+        QPushButton { background-color: rgba(0,0,0,0.25); }
+        QPushButton[docStatus="2"] { background-color: rgba(0,255,0,0.25); }
+        QPushButton[docStatus="1"] { background-color: rgba(255,165,0,0.25); }
+        QPushButton[docStatus="0"] { background-color: rgba(255,0,0,0.25); }
+    """
+
     def __init__(self, window):
         self.window = window
-        self._status = 0
+        self._status = DocStatus.MISSING
 
         self.indicator = self.window.indicator
         self.textEntry = self.window.textEntry
         self.history = self.window.history
 
-        self.history.activated[str].connect(self.set_history_text)
-        self.history.setInsertPolicy = QComboBox.InsertAtTop
+        self.history.activated.connect(self.set_history_text)
+        self.history.setInsertPolicy(QComboBox.InsertAtTop)
+        # Qt drops the oldest entry once the history is full
+        self.history.setMaxCount(20)
 
     @property
     def status(self):
         return self._status
 
     @status.setter
-    def status(self,value):
-        # Document is found in the library with file attached
-        if value == 2:         
-            self.indicator.setStyleSheet("""QPushButton {
-                                                background-color: rgba(0,255,0,0.25); }""")
-            self._status = 2
-
-        elif value == 1:
-            self.window.indicator.setStyleSheet("""QPushButton {
-                                                background-color: rgba(255,165,0,0.25); }""")
-            self._status = 1
-        elif value == 0:
-            self.window.indicator.setStyleSheet("""QPushButton {
-                                            background-color: rgba(255, 0, 0, 0.25); }""")
-        else:
-            raise ValueError('Invalid ')
+    def status(self, value):
+        if value not in self.STATUSES:
+            raise ValueError('Invalid status: %r' % (value,))
+        self._status = value
+
+        # The style sheet is only re-applied to pick up the new property
+        indicator = self.indicator
+        indicator.setProperty('docStatus', '%d' % value)
+        style = indicator.style()
+        style.unpolish(indicator)
+        style.polish(indicator)
 
     def create_text_layout(self, textEntry, indicator):
         #   TODO: Also handle initialization of callbacks
-        indicator.setStyleSheet("""QPushButton {
-                                       background-color: rgba(0,0,0,0.25);
-                                       }""")
+        indicator.setStyleSheet(self.STYLE_SHEET)
         indicator.setAutoFillBackground(True)
         indicator.setFixedSize(20,20)
         indicator.setToolTip("Green: doc DOI in library.\n"
@@ -1515,25 +1700,16 @@ class DocSelectorView(object):
         textline.addWidget(textEntry)
         return textline
 
-    def set_history_text(self, historical_entry):
-        self.textEntry.setText(historical_entry)
+    def set_history_text(self, index):
+        self.textEntry.setText(self.history.itemText(index))
 
     def add_to_history(self, entry):
-        num_items = self.history.count()
-
         # Make sure the same item isn't added twice in a row
         if self.history.itemText(0) == entry:
             return
 
-        if num_items > 20:
-            self.history.removeItem(num_items-1)
-            # self.history.addItem(entry)
-            self.history.insertItem(0, entry)
-            self.history.setCurrentIndex(0)
-        else:
-            # self.history.addItem(entry)
-            self.history.insertItem(0, entry)
-            self.history.setCurrentIndex(0)
+        self.history.insertItem(0, entry)
+        self.history.setCurrentIndex(0)
 
 
 class DocSelector(object):
@@ -1559,7 +1735,7 @@ class DocSelector(object):
 
 
     self.library.sync
-    self.doc_selector.status = 0
+    self.doc_selector.status = DocStatus.MISSING
     
     """    
 
@@ -1567,21 +1743,28 @@ class DocSelector(object):
         self.window = window
         self.text_view = DocSelectorView(self.window)
 
-        # Set int to keep track of if a DOI is in the library
-        # 0 --> DOI is not found in library (indicator red)
-        # 1 --> DOI is found, but there is no file (indicator orange)
-        # 2 --> DOI is found, with file attached (indicator green)
-        self._status = 0
+        # Keeps track of whether the DOI is in the library (see DocStatus)
+        self._status = DocStatus.MISSING
 
         self.type_selector_objs = [self.window.doi_check, self.window.url_check,
                                    self.window.fulltext_check, self.window.pmid_check]
         self.type_selector_names = ['doi', 'url', 'fulltext', 'pmid']
 
+        # The checked type is tracked as the buttons are toggled rather
+        # than found by asking each button whenever it's needed
+        self._entry_type = None
+        for obj, name in zip(self.type_selector_objs, self.type_selector_names):
+            if obj.isChecked():
+                self._entry_type = name
+            obj.toggled.connect(functools.partial(self._type_toggled, name))
+
+    def _type_toggled(self, name, checked):
+        if checked:
+            self._entry_type = name
+
     @property
     def entry_type(self):
-        for x in range(0, len(self.type_selector_objs)):
-            if self.type_selector_objs[x].isChecked():
-                return self.type_selector_names[x]
+        return self._entry_type
 
     @property
     def value(self):
@@ -1614,21 +1797,9 @@ class DocSelector(object):
 
         # Update main paper entry to reflect presence of attached file
         if self.entry_type == 'doi':
-            if value == 0:
-                has_file = 0
-                in_lib = 0
-            elif value == 1:
-                has_file = 0
-                in_lib = 1
-            elif value == 2:
-                has_file = 1
-                in_lib = 1
-            else:
-                has_file = None
-                in_lib = None
-
-            db.update_entry_field(identifying_value=self.value, updating_field=['has_file', 'in_lib'],
-                                  updating_value=[has_file, in_lib], filter_by_doi=True)
+            has_file, in_lib = _ENTRY_FLAGS.get(value, (None, None))
+            _queue_entry_update(identifying_value=self.value, updating_field=['has_file', 'in_lib'],
+                                updating_value=[has_file, in_lib], filter_by_doi=True)
 
         self.text_view.status = value  # This should call a setter method that redraws accordingly
 
@@ -1640,6 +1811,8 @@ class FunctionModel(object):
     def __init__(self, window):
         # Pass in the instance of the EntryWindow
         self.window = window
+        # Incremented by each request_refs() call so only the latest is answered
+        self._refs_request = 0
 
     '''
     def retrieve_refs(self, doi):
@@ -1655,7 +1828,7 @@ class FunctionModel(object):
             error_logging.log(method='gui.Window.get_refs', message='Unsupported Publisher', error=str(exc), doi=doi)
             _send_msg('Unsupported Publisher')
             return
-        except ParseException or AttributeError as exc:
+        except (ParseException, AttributeError) as exc:
             error_logging.log(method='gui.Window.get_refs', message='Error parsing journal page', error=str(exc), doi=doi)
             _send_msg('Error parsing journal page')
             return
@@ -1666,55 +1839,115 @@ class FunctionModel(object):
         return refs
     '''
 
-    def retrieve_only_refs(self, doi):
-        refs = []
-        try:
-            refs = rr.retrieve_only_references(input=doi, input_type='doi')
+    def request_refs(self, doi, on_ready):
+        """
+        Retrieves the references of a paper on a worker thread, since
+        scraping the publisher's page can take several seconds.
+
+        on_ready is called on the main thread with the list of references
+        and their display strings (see _reference_texts), or with None and
+        None if they could not be retrieved. The strings are made on the
+        worker too, so the main thread only has to build the labels. If a
+        newer request is made before this one finishes, this one's result
+        is dropped.
+        """
+        self._refs_request += 1
+        request = self._refs_request
 
-            self.window.data.references = refs
+        def ready(result):
+            if request == self._refs_request:
+                refs, texts = result
+                self.window.data.references = refs
+                on_ready(refs, texts)
 
-        except UnsupportedPublisherError as exc:
+        def failed(exc):
+            if request == self._refs_request:
+                self._report_refs_error(doi, exc)
+                on_ready(None, None)
+
+        worker = Worker(_retrieve_reference_texts, doi)
+        worker.signals.result.connect(ready)
+        worker.signals.error.connect(failed)
+        QThreadPool.globalInstance().start(worker)
+
+    def _report_refs_error(self, doi, exc):
+        if isinstance(exc, UnsupportedPublisherError):
             error_logging.log(method='gui.Window.get_refs', message='Unsupported Publisher', error=str(exc), doi=doi)
             _send_msg('Unsupported Publisher')
-            return
-        except ParseException or AttributeError as exc:
+        elif isinstance(exc, (ParseException, AttributeError)):
             error_logging.log(method='gui.Window.get_refs', message='Error parsing journal page', error=str(exc), doi=doi)
             _send_msg('Error parsing journal page')
-            return
-        except Exception as exc:
-           error_logging.log(method='gui.Window.get_refs', error=str(exc), doi=doi)
-           _send_msg(str(exc))
-
-        return refs
+        else:
+            error_logging.log(method='gui.Window.get_refs', error=str(exc), doi=doi)
+            _send_msg(str(exc))
 
     def add_all_refs(self, main_doi, ref_labels):
-        for x in range(1, ref_labels.count()):
-            label = ref_labels.itemAt(x).widget()
-            doi = label.doi
-            self.window.response_label.setText('Adding: ' + label.small_text)
-            self.window.response_label.repaint()
-            qApp.processEvents()
-
-            label.add_to_library_from_label(doi, index=x, referencing_paper=main_doi, popups=False,
-                update_status=False, adding_all=True)
-
-        # Sync the library
-        self.window.library.sync()
+        """
+        Adds the paper of every reference label with a DOI to the library.
+        The adds are queued on the add thread pool. Once they are all
+        over, the library is synced once and every label is updated.
+        """
+        labels = _layout_widgets(ref_labels)
+        adding = [(x, label) for x, label in enumerate(labels, 1) if label.doi is not None]
+        response_label = self.window.response_label
+        if not adding:
+            response_label.hide()
+            return
 
-        # Update all of the labels
-        for x in range(1, ref_labels.count()):
-            label = ref_labels.itemAt(x).widget()
-            label.update_status(doi=label.doi, adding=True, popups=False, sync=False)
+        total = len(adding)
+        remaining = total
+        generation = self.window._ref_generation
+        response_label.setText(f'Adding references: 0 of {total}')
+
+        def synced():
+            response_label.hide()
+            # Skip the update if the labels were cleared in the meantime
+            if generation == self.window._ref_generation:
+                self._update_statuses(ref_labels, labels, adding=True)
+
+        def one_done():
+            nonlocal remaining
+            remaining -= 1
+            if remaining:
+                response_label.setText(f'Adding references: {total - remaining} of {total}')
+            else:
+                response_label.setText('Syncing library...')
+                _start_sync(self.window.library, synced)
+
+        for x, label in adding:
+            label.add_to_library_from_label(label.doi, index=x, referencing_paper=main_doi, popups=False,
+                update_status=False, adding_all=True, on_done=one_done)
+
+    def _update_statuses(self, layout, labels, adding):
+        # The labels' documents are looked up in one go on a worker, since
+        # they aren't cached right after a sync
+        worker = Worker(self.window.library.get_documents, [label.doi for label in labels if label.doi is not None])
+        worker.signals.result.connect(lambda docs: self._apply_statuses(layout, labels, adding, docs))
+        QThreadPool.globalInstance().start(worker)
+
+    def _apply_statuses(self, layout, labels, adding, docs):
+        # Labels cleared while the lookup ran are skipped, and the reference
+        # area is repainted once after the rest are updated
+        labels = [label for label in labels if not label.removed]
+        if not labels:
+            return
+        container = layout.parentWidget()
+        container.setUpdatesEnabled(False)
+        try:
+            for label in labels:
+                label.update_status(adding=adding, popups=False, sync=False, cached=docs)
+        finally:
+            container.setUpdatesEnabled(True)
 
     def resync(self, main_window=True):
         self.window._set_response_message('Re-syncing with Mendeley...')
-        self.window.library.sync()
+        _clear_references_cache()
+        _start_sync(self.window.library, lambda: self._resynced(main_window))
 
+    def _resynced(self, main_window):
         # If references are visible, update their status and label color
-        if self.window.ref_items_layout.count() > 1:
-            for x in range(1, self.window.ref_items_layout.count()):
-                label = self.window.ref_items_layout.itemAt(x).widget()
-                label.update_status(adding=False, popups=False, sync=False)
+        layout = self.window.ref_items_layout
+        self._update_statuses(layout, _layout_widgets(layout), adding=False)
 
         # This does not run if resync is called from the manual reference entry window.
         if main_window:
@@ -1750,30 +1983,37 @@ class ReferenceLabel(QLabel):
            Requires that the document be in the user's library.
     """
 
+    MENU_STYLE = "QMenu { background-color: #d9d9d9; }"
+
+    # True while show_ref_notes_box is looking up the document
+    _opening_notes = False
+
+    # Set when the label is taken out of its layout to be deleted. Work
+    # finishing on other threads checks it before touching the label,
+    # whose Qt object may already be gone.
+    removed = False
+
+    # Background fill set by RefLabelView; None leaves it unpainted
+    status_color = None
+
+    # QFontMetrics for each font, keyed by QFont.key()
+    _metrics_cache = {}
+
+    # (right-click menu, its actions by name) for each label class
+    _menus = {}
+
     def __init__(self, text, parent):
         super().__init__()
 
         self.parent = parent
         self.view = RefLabelView(self)
 
-        self.metrics = QFontMetrics(self.font())
-        elided = self.metrics.elidedText(text, Qt.ElideRight, self.width())
-
         self.setText(text)
-        self.expanded_text = None
+        self._expanded_lines = []
         self.small_text = None
         self.reference = None
         self.doi = None
-
-        self.menu = QMenu(self)
-        self.add_to_lib = self.menu.addAction("Add to library")
-        self.ref_lookup = self.menu.addAction("Look up references")
-        self.ref_follow_forward = self.menu.addAction("Follow refs forward")
-        self.move_to_trash = self.menu.addAction("Move to trash")
-        self.add_doi = self.menu.addAction("Find DOI")
-        self.manual_ref_entry = self.menu.addAction("Manual Reference Entry")
-        self.copy_doi = self.menu.addAction("Copy DOI")
-        self.menu.setStyleSheet("QMenu { background-color: #d9d9d9; }")
+        self.tnw = None
 
         self.ClickFilter = ClickFilter(self)
         self.installEventFilter(self.ClickFilter)
@@ -1783,13 +2023,71 @@ class ReferenceLabel(QLabel):
         self.ClickFilter.clicked.connect(self.change_ref_label)
         self.ClickFilter.doubleclicked.connect(self.show_ref_notes_box)
 
-        # Connect copy to clipboard shortcut
-        self.copy_shortcut = QShortcut(QKeySequence("Ctrl+C"), self)
-        self.copy_shortcut.activated.connect(_copy_to_clipboard)
-
         self.setTextInteractionFlags(Qt.TextSelectableByMouse)
         self.setWordWrap(True)
 
+    @property
+    def expanded_text(self):
+        # Kept as a list of lines so adding a line doesn't copy the text
+        lines = self._expanded_lines
+        return '\n'.join(lines) if lines else None
+
+    @expanded_text.setter
+    def expanded_text(self, text):
+        self._expanded_lines = [] if text is None else [text]
+
+    def add_expanded_line(self, line):
+        self._expanded_lines.append(line)
+
+    @property
+    def metrics(self):
+        # Nothing needs the metrics while the labels are being built, so
+        # they are only fetched when asked for. Labels share one
+        # QFontMetrics per font.
+        font = self.font()
+        key = font.key()
+        metrics = ReferenceLabel._metrics_cache.get(key)
+        if metrics is None:
+            metrics = ReferenceLabel._metrics_cache[key] = QFontMetrics(font)
+        return metrics
+
+    def _exec_menu(self, pos):
+        """
+        Shows the right-click menu at pos and returns the name of the
+        chosen action, or None.
+        """
+        # All labels of a class share one right-click menu, built the
+        # first time any of them needs it
+        cls = type(self)
+        built = ReferenceLabel._menus.get(cls)
+        if built is None:
+            built = ReferenceLabel._menus[cls] = cls._build_menu()
+        menu, actions = built
+
+        chosen = menu.exec_(self.mapToGlobal(pos))
+        for name, action in actions.items():
+            if action == chosen:
+                return name
+        return None
+
+    @classmethod
+    def _build_menu(cls):
+        """
+        Returns a new right-click menu and a dict of its actions by name.
+        """
+        menu = QMenu()
+        actions = {
+            'add_to_lib': menu.addAction("Add to library"),
+            'ref_lookup': menu.addAction("Look up references"),
+            'ref_follow_forward': menu.addAction("Follow refs forward"),
+            'move_to_trash': menu.addAction("Move to trash"),
+            'find_doi': menu.addAction("Find DOI"),
+            'manual_ref_entry': menu.addAction("Manual Reference Entry"),
+            'copy_doi': menu.addAction("Copy DOI"),
+        }
+        menu.setStyleSheet(cls.MENU_STYLE)
+        return menu, actions
+
     def change_ref_label(self):
         """
         Expands or compresses reference label on click
@@ -1812,25 +2110,46 @@ class ReferenceLabel(QLabel):
             _send_msg('No DOI found for this paper.')
             return
 
-        try:
-            doc_response_json = self.parent.library.get_document(self.doi, return_json=True)
-        except DOINotFoundError:
+        # Bring back the notes window if it is still open rather than
+        # building a new one (and dropping any unsaved changes)
+        if self.tnw is not None and self.tnw.isVisible():
+            self.tnw.raise_()
+            self.tnw.activateWindow()
+            return
+
+        # A lookup for the window is already running
+        if self._opening_notes:
+            return
+        self._opening_notes = True
+
+        # The document is looked up on a worker. It is served from the
+        # library's document cache after the first open.
+        worker = Worker(self.parent.library.get_document, self.doi, return_json=True)
+        worker.signals.result.connect(self._open_notes)
+        worker.signals.error.connect(self._notes_lookup_failed)
+        QThreadPool.globalInstance().start(worker)
+
+    def _notes_lookup_failed(self, exc):
+        self._opening_notes = False
+        if self.removed:
+            return
+        if isinstance(exc, DOINotFoundError):
             reply = QMessageBox.question(self.parent,'Message', 'Document not found in library.\nWould you like to add it?',
                                  QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
                 self.add_to_library_from_label(self.doi)
-                return
-            else:
-                return
-        except Exception as exe:
-            _send_msg(str(exe))
-            return
+        else:
+            _send_msg(str(exc))
 
+    def _open_notes(self, doc_response_json):
+        self._opening_notes = False
+        if self.removed:
+            return
         notes = doc_response_json.get('notes')
         self.tnw = TabbedNotesWindow(parent=self.parent, notes=notes, doc_json=doc_response_json, label=self)
         self.tnw.show()
 
-    def update_status(self, doi=None, adding=False, popups=True, sync=True):
+    def update_status(self, doi=None, adding=False, popups=True, sync=True, cached=None):
         """
         Updates the indicators about whether a certain paper is in the user's library.
         If from a reference label, change color of that label.
@@ -1841,9 +2160,20 @@ class ReferenceLabel(QLabel):
             DOI of the paper to check for.
         adding : bool
             Indicates whether a paper is being added or deleted.
+        cached : dict
+            Library entries already looked up with library.get_documents.
+            If given, the label's entry is taken from here instead of
+            looking it up again.
+
+        The sync and the document lookup both run off the GUI thread; the
+        label is updated once they come back, unless it was removed.
         """
         if sync:
-            self.parent.library.sync()
+            def synced():
+                if not self.removed:
+                    self.update_status(doi, adding=adding, popups=popups, sync=False, cached=cached)
+            _start_sync(self.parent.library, synced)
+            return
 
         # A DOI is supplied to this function if it is being added to the label.
         if doi is not None:
@@ -1867,48 +2197,63 @@ class ReferenceLabel(QLabel):
         if doi is None:
             return
 
-        try:
-            doc_json = self.parent.library.get_document(doi, return_json=True)
-        except DocNotFoundError:
+        if cached is None:
+            # Look the document up on a worker, then come back with it
+            def found(doc_json):
+                if not self.removed:
+                    self.update_status(adding=adding, popups=popups, sync=False, cached={doi: doc_json})
+
+            def failed(exc):
+                if self.removed:
+                    return
+                if isinstance(exc, DocNotFoundError):
+                    found(None)
+                    return
+                if adding:
+                    if popups:
+                        _send_msg('An error occurred during sync.\nDocument may not have been added.')
+                self.status = DocStatus.MISSING
+
+            worker = Worker(self.parent.library.get_document, doi, return_json=True)
+            worker.signals.result.connect(found)
+            worker.signals.error.connect(failed)
+            QThreadPool.globalInstance().start(worker)
+            return
+
+        # Looked up by the caller; None means it isn't in the library
+        doc_json = cached.get(doi)
+
+        if doc_json is None:
             # Document was not found in library
             if popups:
                 _send_msg('Document not in library.')
-            self.status = 0
-        except Exception:
-            if adding:
-                if popups:
-                    _send_msg('An error occurred during sync.\nDocument may not have been added.')
-            self.status = 0
-        else:
-            has_file = doc_json.get('file_attached')
-            if adding:
-                if has_file is not None:
-                    # If no file is found, there may have been an error.
-                    # Give users the ability to delete the document that was added without file.
-                    if not has_file:
-                        msgBox = QMessageBox()
-                        msgBox.setText('Document was added without a file attached.\n'
-                                       'Automatic PDF retrieval may have failed.\n'
-                                       'If this was in error, you may choose to delete\n'
-                                       'the document and attempt to add again. Otherwise, ignore this message.')
-                        delete_button = QPushButton('Delete')
-                        msgBox.addButton(delete_button, QMessageBox.RejectRole)
-                        delete_button.clicked.connect(lambda: self.move_doc_to_trash(doi=doi))
-                        msgBox.addButton(QPushButton('Ignore'), QMessageBox.AcceptRole)
+            self.status = DocStatus.MISSING
+            return
 
-                        reply = msgBox.exec_()
+        # A missing 'file_attached' counts as having a file
+        has_file = doc_json.get('file_attached')
+        no_file = has_file is not None and not has_file
 
-                        # If the user chose to delete, exit this function.
-                        if reply != QMessageBox.Accepted:
-                            return
+        if adding and no_file:
+            # If no file is found, there may have been an error.
+            # Give users the ability to delete the document that was added without file.
+            msgBox = QMessageBox()
+            msgBox.setText('Document was added without a file attached.\n'
+                           'Automatic PDF retrieval may have failed.\n'
+                           'If this was in error, you may choose to delete\n'
+                           'the document and attempt to add again. Otherwise, ignore this message.')
+            delete_button = QPushButton('Delete')
+            msgBox.addButton(delete_button, QMessageBox.RejectRole)
+            delete_button.clicked.connect(lambda: self.move_doc_to_trash(doi=doi))
+            msgBox.addButton(QPushButton('Ignore'), QMessageBox.AcceptRole)
 
-            if has_file is not None:
-                if has_file:
-                    self.status = 2
-                else:
-                    self.status = 1
-            else:
-                self.status = 2
+            reply = msgBox.exec_()
+
+            # If the user chose to delete, exit this function.
+            if reply != QMessageBox.Accepted:
+                return
+
+        self.status = DocStatus.IN_LIB_NO_FILE if no_file else DocStatus.IN_LIB_WITH_FILE
 
     @property
     def status(self):
@@ -1918,50 +2263,45 @@ class ReferenceLabel(QLabel):
     def status(self, value):
         if value is not None:
             self.view.status = value
-            if value == 0:
-                has_file = 0
-                in_lib = 0
-            elif value == 1:
-                has_file = 0
-                in_lib = 1
-            elif value == 2:
-                has_file = 1
-                in_lib = 1
-            else:
-                has_file = None
-                in_lib = None
-        else:
-            has_file = None
-            in_lib = None
+        has_file, in_lib = _ENTRY_FLAGS.get(value, (None, None))
 
         if self.doi is not None:
-            db.update_entry_field(identifying_value=self.doi, updating_field=['has_file', 'in_lib'],
-                                  updating_value=[has_file, in_lib], filter_by_doi=True)
+            _queue_entry_update(identifying_value=self.doi, updating_field=['has_file', 'in_lib'],
+                                updating_value=[has_file, in_lib], filter_by_doi=True)
+
+    def paintEvent(self, event):
+        # Fill in the status color, then let QLabel draw the text over it
+        if self.status_color is not None:
+            painter = QPainter(self)
+            painter.fillRect(self.rect(), self.status_color)
+            painter.end()
+        super().paintEvent(event)
 
     def contextMenuEvent(self, QContextMenuEvent):
-        action = self.menu.exec_(self.mapToGlobal(QContextMenuEvent.pos()))
-        if action == self.add_to_lib:
+        action = self._exec_menu(QContextMenuEvent.pos())
+        if action == 'add_to_lib':
             self.add_to_library_from_label(self.doi)
-        elif action == self.ref_lookup:
+        elif action == 'ref_lookup':
             self.lookup_ref(self.doi)
-        elif action == self.ref_follow_forward:
+        elif action == 'ref_follow_forward':
             self.follow_forward(self.doi)
-        elif action == self.move_to_trash:
+        elif action == 'move_to_trash':
             self.move_doc_to_trash(self.doi)
-        elif action == self.add_doi:
+        elif action == 'find_doi':
             self.add_doi()
-        elif action == self.manual_ref_entry:
+        elif action == 'manual_ref_entry':
             self.ref_entry()
-        elif action == self.copy_doi:
+        elif action == 'copy_doi':
             self.copy_doi_to_clipboard()
 
     # ++++++++++++++++++++++++++++++++++++++++++++
     # ============================================ Reference Label Right-Click Functions
     # ++++++++++++++++++++++++++++++++++++++++++++
     def add_to_library_from_label(self, doi, index=None, referencing_paper=None, popups=True,
-                                  update_status=True, adding_all=False):
+                                  update_status=True, adding_all=False, on_done=None):
         """
         Adds reference paper to library from right-clicking on a label.
+        The paper is added on a worker thread.
 
         Parameters
         ----------
@@ -1971,6 +2311,9 @@ class ReferenceLabel(QLabel):
             DOI of the paper in the clicked label.
         popups : bool
             If False, suppresses warning pop-up windows.
+        on_done : function
+            Called on the main thread once the add is over, whether or not
+            it worked. Not called if nothing was added.
         """
         # Check that there is a DOI
         if doi is None:
@@ -1982,53 +2325,73 @@ class ReferenceLabel(QLabel):
         # If all references are added at once, there are no library syncs in between, so
         # check database for duplicates before adding.
         if adding_all:
-            if db.check_for_document(doi):
+            if popups:
+                def checked(found):
+                    if found:
+                        _send_msg('Paper is already in library.')
+                _run_in_db_thread(db.check_for_document, doi, on_result=checked)
+        # If one reference is being added at a time, the library is checked for
+        # duplicates before adding. The check is made on the add thread, since it
+        # can wait on the library while another add or a sync is running.
+        library = self.parent.library
+        check_library = not adding_all and is_valid_doi(doi)
+
+        def add():
+            if check_library and library.contains_doi(doi):
+                return False
+            library.add_to_library(doi)
+            return True
+
+        self.parent.focus()
+
+        def added(was_added=True):
+            if not was_added:
                 if popups:
                     _send_msg('Paper is already in library.')
-        # If one reference is being added at a time, check the library for duplicates
-        # before adding.
-        else:
-            if self.parent._check_lib(doi):
+                return
+            # The label may have been cleared while the paper was added
+            if update_status and not self.removed:
+                self.update_status(doi, adding=True, popups=popups)
+
+        # Have separate windows for each possible error
+        def failed(exc):
+            method = 'gui.Window.add_to_library_from_label'
+            if isinstance(exc, UnsupportedPublisherError):
+                error_logging.log(method=method, message='Publisher unsupported', error=str(exc), doi=doi,
+                    ref_index=index, main_lookup=referencing_paper)
                 if popups:
-                    _send_msg('Paper is already in library.')
+                    _send_msg('Publisher is not yet supported.\n'
+                                        'Document not added.')
                 return
+            if isinstance(exc, CallFailedException):
+                error_logging.log(method=method, message='Call failed', error=str(exc), doi=doi,
+                    ref_index=index, main_lookup=referencing_paper)
+                if popups:
+                    _send_msg(str(exc))
+                return
+            if isinstance(exc, ParseException):
+                error_logging.log(method=method, message='Error parsing webpage', error=str(exc), doi=doi,
+                    ref_index=index, main_lookup=referencing_paper)
+                if popups:
+                    _send_msg(str(exc))
+            elif isinstance(exc, (TypeError, AttributeError)):
+                error_logging.log(method=method, message='Error parsing webpage', error=str(exc), doi=doi,
+                    ref_index=index, main_lookup=referencing_paper)
+                if popups:
+                    _send_msg('Error parsing page.')
+            else:
+                error_logging.log(method=method, error=str(exc), doi=doi,
+                    ref_index=index, main_lookup=referencing_paper)
+                if popups:
+                    _send_msg(str(exc))
+            added()
 
-        self.parent.focus()
-
-        # Try to add, have separate windows for each possible error
-        try:
-            self.parent.library.add_to_library(doi)
-        except UnsupportedPublisherError as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_label', message='Publisher unsupported', error=str(exc), doi=doi,
-                ref_index=index, main_lookup=referencing_paper)
-            if popups:
-                _send_msg('Publisher is not yet supported.\n'
-                                    'Document not added.')
-            return
-        except CallFailedException as call:
-            error_logging.log(method='gui.Window.add_to_library_from_label', message='Call failed', error=str(call), doi=doi,
-                ref_index=index, main_lookup=referencing_paper)
-            if popups:
-                _send_msg(str(call))
-            return
-        except ParseException as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_label', message='Error parsing webpage', error=str(exc), doi=doi,
-                ref_index=index, main_lookup=referencing_paper)
-            if popups:
-                _send_msg(str(exc))
-        except TypeError or AttributeError as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_label', message='Error parsing webpage', error=str(exc), doi=doi,
-                ref_index=index, main_lookup=referencing_paper)
-            if popups:
-                _send_msg('Error parsing page.')
-        except Exception as exc:
-            error_logging.log(method='gui.Window.add_to_library_from_label', error=str(exc), doi=doi,
-                ref_index=index, main_lookup=referencing_paper)
-            if popups:
-                _send_msg(str(exc))
-
-        if update_status:
-            self.update_status(doi, adding=True, popups=popups)
+        worker = Worker(add)
+        worker.signals.result.connect(added)
+        worker.signals.error.connect(failed)
+        if on_done is not None:
+            worker.signals.finished.connect(on_done)
+        _add_pool.start(worker)
 
     def lookup_ref(self, doi):
         """
@@ -2077,8 +2440,23 @@ class ReferenceLabel(QLabel):
         """
         if doi is None:
             doi = self.doi
-        self.parent.library.trash_document(doi=doi)
-        self.update_status(doi)
+
+        def trashed(result=None):
+            if not self.removed:
+                self.update_status(doi)
+
+        def failed(exc):
+            if isinstance(exc, DocNotFoundError):
+                _send_msg('Document not found in library.')
+            else:
+                error_logging.log(method='gui.ReferenceLabel.move_doc_to_trash', error=str(exc), doi=doi)
+                _send_msg(str(exc))
+
+        # The API call is paced by the rate limiter, so it runs on a worker
+        worker = Worker(self.parent.library.trash_document, doi=doi)
+        worker.signals.result.connect(trashed)
+        worker.signals.error.connect(failed)
+        QThreadPool.globalInstance().start(worker)
 
     def add_doi(self):
         """
@@ -2089,48 +2467,43 @@ class ReferenceLabel(QLabel):
         if self.doi is not None:
             return
 
-        authors = self.reference.get('authors')
-        date = self.reference.get('year')
+        # The lookup is a network call, so it runs on the citation pool
+        lookup = _citation_lookup(self.expanded_text)
+        worker = Worker(_doi_and_title_from_citation, lookup)
+        worker.signals.result.connect(lambda result: self._doi_found(citing_doi, *result))
+        _citation_pool.start(worker)
+
+    def _doi_found(self, citing_doi, doi, retrieved_title):
+        # Runs on the main thread with the result of add_doi's lookup
+        ref = self.reference
+        authors = ref.get('authors')
+        date = ref.get('year')
         if date is None:
-            date = self.reference.get('date')
+            date = ref.get('date')
 
-        lookup = self.expanded_text
-        lookup = lookup.replace('\n', ' ')
-        doi, retrieved_title = rr.doi_and_title_from_citation(lookup)
-        if doi is not None and '10.' in doi:
+        if is_valid_doi(doi):
             self.doi = doi
-            self.reference['doi'] = doi
-            title = self.reference.get('title')
+            title = ref.get('title')
 
             # This is if there is no title in a given reference
             if title is None:
                 title = retrieved_title
-                self.reference.title = title
                 if title is not None:
-                    if len(title) > 60:
-                        short_title = title[0:60]
-                    else:
-                        short_title = title
-                    self.small_text = self.small_text + short_title
-                    self.expanded_text = self.expanded_text + '\n' + title
-
-            self.expanded_text = self.expanded_text + '\n' + doi
-
-            if authors is not None:
-                # Update the reference entry within the database to
-                # reflect the change.
-                db.update_reference_field(identifying_value=date, updating_field=['doi', 'title'],
-                                        updating_value=[doi, title], citing_doi=citing_doi,
-                                        authors=authors, filter_by_authors=True)
-            elif title is not None:
-                # Update the reference entry within the database to
-                # reflect the change.
-                db.update_reference_field(identifying_value=title, updating_field=['doi', 'title'],
-                                    updating_value=[doi, title], filter_by_title=True)
+                    self.small_text = self.small_text + title[:60]
+                    self.add_expanded_line(title)
+
+            self.add_expanded_line(doi)
+            ref.update({'doi': doi, 'title': title})
+            _forget_reference_texts(citing_doi)
+
+            # Update the reference entry within the database to reflect the change.
+            _queue_doi_update(citing_doi, doi, title, authors, date)
+            _flush_reference_updates()
+        # Syncs first, then updates the label if it is still shown
         self.update_status(doi=doi, popups=False)
 
     def ref_entry(self):
-        # if self.status != 2:
+        # if self.status != DocStatus.IN_LIB_WITH_FILE:
         #     _send_msg('Paper must be in library and have an attached PDF for manual reference entry.')
         #     return
 
@@ -2144,8 +2517,19 @@ class ReferenceLabel(QLabel):
 
 
 class RefLabelView(object):
+
+    # Label background for each status, indexed by the status. Unknown (3)
+    # keeps the current one. The label paints these itself, which is much
+    # cheaper than giving every label its own style sheet.
+    COLORS = (
+        QColor(255, 0, 0, 64),      # DocStatus.MISSING
+        QColor(255, 165, 0, 64),    # DocStatus.IN_LIB_NO_FILE
+        QColor(0, 255, 0, 64),      # DocStatus.IN_LIB_WITH_FILE
+        None,                       # DocStatus.UNKNOWN
+    )
+
     def __init__(self, label):
-        self._status = 0
+        self._status = DocStatus.MISSING
         self.parent = label
 
     @property
@@ -2159,28 +2543,28 @@ class RefLabelView(object):
         # Neutral if there is no DOI
         self._status = value
 
-        if value == 2:
-            self.parent.setStyleSheet("background-color: rgba(0,255,0,0.25);")
-        elif value == 1:
-            self.parent.setStyleSheet("background-color: rgba(255,165,0,0.25);")
-        elif value == 0:
-            self.parent.setStyleSheet("background-color: rgba(255,0,0,0.25);")
-        return
+        # Skip the repaint if the label already shows this color (common
+        # when a whole list of labels is refreshed)
+        color = self.COLORS[value]
+        if color is not None and color is not self.parent.status_color:
+            self.parent.status_color = color
+            self.parent.update()
 
 
 class ReferenceEntryLabel(ReferenceLabel):
-    def __init__(self, text, parent):
-        super().__init__(text=text, parent=parent)
-        self.delete_ref = self.menu.addAction("Delete Reference")
-        self.menu.setStyleSheet("QMenu { background-color: #d9d9d9; }")
+    @classmethod
+    def _build_menu(cls):
+        menu, actions = super()._build_menu()
+        actions['delete_ref'] = menu.addAction("Delete Reference")
+        return menu, actions
 
     def contextMenuEvent(self, QContextMenuEvent):
-        action = self.menu.exec_(self.mapToGlobal(QContextMenuEvent.pos()))
-        if action == self.delete_ref:
+        action = self._exec_menu(QContextMenuEvent.pos())
+        if action == 'delete_ref':
             self.delete_reference()
 
     def delete_reference(self):
-        db.delete_reference(self.reference)
+        _run_in_db_thread(_delete_reference, self.reference)
         self.parent.remove_label(self)
 
 
@@ -2225,8 +2609,8 @@ class ReferenceEntryWindow(QWidget):
                 self.title_list.append(ref.title)
 
         # Connect copy to clipboard shortcut
-        self.copy_shortcut = QShortcut(QKeySequence("Ctrl+C"), self)
-        self.copy_shortcut.activated.connect(_copy_to_clipboard)
+        self.copy_shortcut = QShortcut(QKeySequence.Copy, self)
+        self.copy_shortcut.activated.connect(_copy_selection)
 
         self.initUI()
 
@@ -2292,7 +2676,7 @@ class ReferenceEntryWindow(QWidget):
 
 
         self.refresh.clicked.connect(self.fModel.resync)
-        self.get_refs_button.clicked.connect(self.get_refs)
+        self.get_refs_button.clicked.connect(lambda: self.get_refs())
         self.enter_button.clicked.connect(self.submit)
         self.clear_button.clicked.connect(lambda: self._reset_forms(next_id=False))
 
@@ -2362,10 +2746,6 @@ class ReferenceEntryWindow(QWidget):
         # Set layout to be the vertical box.
         self.setLayout(self.vbox)
 
-        # Connect copy to clipboard shortcut
-        self.copy_shortcut = QShortcut(QKeySequence("Ctrl+C"), self)
-        self.copy_shortcut.activated.connect(_copy_to_clipboard)
-
         self.display_refs(refs=self.references)
 
         self.resize(800,700)
@@ -2388,14 +2768,15 @@ class ReferenceEntryWindow(QWidget):
             return
 
         # Resolve DOI and get references
-        refs = self.fModel.retrieve_only_refs(doi=self.main_paper_doi)
+        self.fModel.request_refs(self.main_paper_doi, self._show_refs)
 
+    def _show_refs(self, refs, texts):
         if refs is None or len(refs) == 0:
             self.data.references = None
             _send_msg('No references found.')
             return
 
-        self.display_refs(refs)
+        self.display_refs(refs, texts)
 
     def submit(self):
         self.response_label.hide()
@@ -2449,19 +2830,20 @@ class ReferenceEntryWindow(QWidget):
             if reply == QMessageBox.No:
                 return
 
-        db.add_reference([ref_dict], main_doi=self.main_paper_doi)
+        _run_in_db_thread(_add_reference, ref_dict, self.main_paper_doi)
         label = self.ref_to_label(ref=ref_dict)
-        self.ref_items_layout.insertWidget(self.ref_area_layout.count() - 1, label)
+        self.ref_items_layout.addWidget(label)
 
         self._reset_forms()
 
         self.response_label.hide()
         self.ref_area.show()
 
-    def display_refs(self, refs=None):
+    def display_refs(self, refs=None, texts=None):
         """
         Gets references for paper corresponding to the DOI in text field.
-        Displays reference information in scrollable area.
+        Displays reference information in scrollable area. texts, if given,
+        are the references' display strings from _reference_texts().
         """
         self.response_label.hide()
 
@@ -2479,11 +2861,15 @@ class ReferenceEntryWindow(QWidget):
         # delete all of those reference labels before adding more.
         _delete_all_widgets(self.ref_items_layout)
 
-        for ref in refs:
-            ref_label = self.ref_to_label(ref)
-            self.ref_items_layout.insertWidget(self.ref_area_layout.count() - 1, ref_label)
+        if texts is None:
+            texts = [None] * len(refs)
+
+        ref_labels = []
+        for ref, text in zip(refs, texts):
+            ref_labels.append(self.ref_to_label(ref, text))
             self.doi_list.append(ref.doi)
             self.title_list.append(ref.title)
+        _add_widgets(self.ref_items_layout, ref_labels)
 
         self.response_label.hide()
         self.ref_area.show()
@@ -2491,7 +2877,7 @@ class ReferenceEntryWindow(QWidget):
     # ++++++++++++++++++++++++++++++++++++++++++++
     # ============================================ Reference Label Functions
     # ++++++++++++++++++++++++++++++++++++++++++++
-    def ref_to_label(self, ref):
+    def ref_to_label(self, ref, texts=None):
         """
         Creates a ReferenceLabel object from a single paper reference.
         Formats title, author information for display, connects functionality
@@ -2502,80 +2888,33 @@ class ReferenceEntryWindow(QWidget):
         ----------
         ref: dict
             Contains information from a single paper reference.
+        texts: tuple
+            The reference's (small_text, expanded_text) from _reference_texts(),
+            if they were already made on the worker thread.
 
         Returns
         -------
         ref_label: ReferenceLabel
             For display in reference box.
         """
-        # Extract main display info
-        ref_id = ref.get('ref_id')
-        ref_title = ref.get('title')
-        ref_author_list = ref.get('authors')
         ref_doi = ref.get('doi')
-        ref_year = ref.get('year')
-        if ref_year is None:
-            ref_year = ref.get('date')
-
-        if isinstance(ref_author_list, str):
-            ref_author_list = ref_author_list.split('; ')
-
-        # Format short and long author lists
-        if ref_author_list is not None:
-            ref_full_authors = '; '.join(ref_author_list)
-            if len(ref_author_list) > 2:
-                ref_first_authors = ref_author_list[0] + ', ' + ref_author_list[1] + ', et al.'
-            else:
-                ref_first_authors = ref_full_authors
-        else:
-            ref_first_authors = ''
-            ref_full_authors = ''
-
-        # Initialize indicator about whether reference is in library
-        in_lib = 3
-
-        # Build up strings with existing info
-        # Small text is for abbreviated preview.
-        # Expanded text is additional information for the larger
-        # reference view when a label is clicked.
-        ref_small_text = ''
-        ref_expanded_text = ''
-        if ref_id is not None:
-            ref_small_text = ref_small_text + str(ref_id) + '. '
-            ref_expanded_text = ref_expanded_text + str(ref_id) + '. '
-        if ref_author_list is not None:
-            ref_small_text = ref_small_text + ref_first_authors
-            ref_expanded_text = ref_expanded_text + ref_full_authors
-        if ref.get('publication') is not None:
-            ref_expanded_text = ref_expanded_text + '\n' + ref.get('publication')
-        if ref_year is not None:
-            ref_small_text = ref_small_text + ', ' + ref_year
-            ref_expanded_text = ref_expanded_text + ', ' + ref_year
-        if ref_title is not None:
-            ref_small_text = ref_small_text + ', ' + ref_title
-            ref_expanded_text = ref_expanded_text + '\n' + ref_title
-        if ref_doi is not None:
-            ref_expanded_text = ref_expanded_text + '\n' + ref_doi
-            try:
-                doc_json = self.library.get_document(ref_doi, return_json=True)
-                has_file = doc_json.get('file_attached')
-                if has_file:
-                    in_lib = 2
-                else:
-                    in_lib = 1
-            except Exception:
-                in_lib = 0
 
-        # Cut off length of small text to fit within window
-        ref_small_text = td(ref_small_text, 66)
+        if texts is None:
+            texts = _reference_texts(ref)
+        ref_small_text, ref_expanded_text = texts
 
         # Make ReferenceLabel object and set attributes
         ref_label = ReferenceEntryLabel(ref_small_text, self)
         ref_label.small_text = ref_small_text
         ref_label.expanded_text = ref_expanded_text
         ref_label.reference = ref
-        ref_label.doi = ref.get('doi')
-        ref_label.status = in_lib
+        ref_label.doi = ref_doi
+
+        # The label starts out unknown and is colored once its document
+        # has been looked up on a worker
+        ref_label.view.status = DocStatus.UNKNOWN
+        if ref_doi is not None:
+            ref_label.update_status(popups=False, sync=False)
 
         # Append all labels to reference text lists in in Data()
         self.data.small_ref_labels.append(ref_small_text)
@@ -2586,6 +2925,7 @@ class ReferenceEntryWindow(QWidget):
     def remove_label(self, label):
         # index = self.ref_items_layout.indexOf(label)
         self.ref_items_layout.removeWidget(label)
+        label.removed = True
         label.deleteLater()
 
 
@@ -2624,10 +2964,9 @@ class ReferenceEntryWindow(QWidget):
             entered_doi = self.doc_selector.value
         else: entered_doi = doi
 
-        if entered_doi == '':
+        if not is_valid_doi(entered_doi):
             return False
-        in_library = self.library.check_for_document(entered_doi)
-        return in_library
+        return self.library.contains_doi(entered_doi)
 
     def _set_response_message(self, message):
         """
@@ -2661,33 +3000,181 @@ class ReferenceEntryWindow(QWidget):
 
 class LibraryInterface(object):
 
+    # One interface per library type, shared by all of the windows so they
+    # use the same client, API connection and document cache
+    _instances = {}
+
     @classmethod
     def create(self, library_type):
         """
-        Creates instance of the user library
+        Creates instance of the user library, or returns the one already
+        created for that library type
 
         Returns: UserLibrary object
         """
+        library = LibraryInterface._instances.get(library_type)
+        if library is not None:
+            return library
+
         if library_type == 'Mendeley':
-            return MendeleyLibraryInterface()
+            library = LibraryInterface._instances[library_type] = MendeleyLibraryInterface()
+            return library
 
         return None
 
 
 class MendeleyLibraryInterface(LibraryInterface):
-    
+
+    # Number of get_document results kept in memory
+    DOC_CACHE_SIZE = 4096
+
+    # Calls made through self.api wait on this, so bulk operations are
+    # paced at 30 calls a minute instead of running into the API's rate
+    # limit. Waiting can sleep, so those calls are only made from worker
+    # threads.
+    _api_limiter = TokenBucket(30, 30 / 60)
+
     def __init__(self):
-        self.lib = client_library.UserLibrary()
-        self.api = API()
+        # LRU cache of get_document results, keyed by (doi, return_json),
+        # and of check_for_document results, keyed by ('check', doi, pmid).
+        # Misses are cached too (as the exception that was raised) so a DOI
+        # that isn't in the library is only looked up once. get_document is
+        # called from worker threads, hence the lock. The generation is
+        # bumped whenever the cache is cleared, so a lookup that started
+        # before then doesn't store its now stale result.
+        self._doc_cache = OrderedDict()
+        self._doc_cache_lock = threading.Lock()
+        self._doc_cache_generation = 0
+
+        # Held for every call into the client library and API. They are
+        # used from the sync, add and lookup threads, and neither is known
+        # to be safe to share between threads, so only one thread uses
+        # them at a time.
+        self._client_lock = threading.RLock()
+
+    # The client library and API are only created when first used, so
+    # building the windows doesn't wait on loading the library
+
+    @functools.cached_property
+    def lib(self):
+        return client_library.UserLibrary()
+
+    @functools.cached_property
+    def api(self):
+        return API()
 
     def sync(self):
-        self.lib.sync()
+        with self._client_lock:
+            self.lib.sync()
+        self._clear_doc_cache()
 
     def check_for_document(self, doi=None, pmid=None):
-        return self.lib.check_for_document(doi=doi, pmid=pmid)
+        # DOIs are case-insensitive, so the result is kept under the
+        # normalized DOI, which is what _set_doc_presence updates
+        key = ('check', _doi_key(doi), pmid)
+        with self._doc_cache_lock:
+            if key in self._doc_cache:
+                self._doc_cache.move_to_end(key)
+                return self._doc_cache[key]
+            generation = self._doc_cache_generation
+
+        with self._client_lock:
+            present = self.lib.check_for_document(doi=doi, pmid=pmid)
+        self._store_doc(key, present, generation)
+        return present
+
+    def contains_doi(self, doi):
+        """
+        Returns True if the DOI is in the library. Only the first check
+        of a DOI goes to the client library. After that it is answered
+        from memory, and adding or trashing the DOI here updates the
+        answer rather than forgetting it.
+        """
+        return self.check_for_document(doi=doi)
 
     def get_document(self, doi, return_json=False):
-        return self.lib.get_document(doi=doi, return_json=return_json)
+        key = (doi, return_json)
+        with self._doc_cache_lock:
+            if key in self._doc_cache:
+                self._doc_cache.move_to_end(key)
+                cached = self._doc_cache[key]
+                if isinstance(cached, DocNotFoundError):
+                    raise cached.with_traceback(None)
+                return cached
+            generation = self._doc_cache_generation
+
+        try:
+            with self._client_lock:
+                doc = self.lib.get_document(doi=doi, return_json=return_json)
+        except DocNotFoundError as exc:
+            self._store_doc(key, exc.with_traceback(None), generation)
+            raise
+        self._store_doc(key, doc, generation)
+        return doc
+
+    def get_documents(self, dois):
+        """
+        Looks up several DOIs in one call, for use from a single worker.
+        UserLibrary has no multi-DOI query, so this goes through
+        get_document (and its cache) for each one.
+
+        Parameters
+        ----------
+        dois : list
+            DOIs to look up.
+
+        Returns
+        -------
+        docs : dict
+            Maps each DOI to its document JSON, or None if it isn't in the library.
+        """
+        # DOIs are case-insensitive and a reference list can cite the same
+        # paper more than once, so each distinct DOI is only looked up once
+        found = {}
+        docs = {}
+        for doi in dois:
+            key = _doi_key(doi)
+            if key not in found:
+                try:
+                    found[key] = self.get_document(doi, return_json=True)
+                except Exception:
+                    found[key] = None
+            docs[doi] = found[key]
+        return docs
+
+    def _store_doc(self, key, value, generation):
+        with self._doc_cache_lock:
+            if generation != self._doc_cache_generation:
+                return
+            self._doc_cache[key] = value
+            if len(self._doc_cache) > self.DOC_CACHE_SIZE:
+                self._doc_cache.popitem(last=False)
+
+    def _set_doc_presence(self, doi, present):
+        # Called after a document is added or trashed. Only that DOI's
+        # entries are dropped, and whether it is present is recorded if
+        # that is known. The generation is still bumped, since a lookup
+        # of the DOI may be in flight.
+        key_doi = _doi_key(doi)
+        with self._doc_cache_lock:
+            stale = [key for key in self._doc_cache
+                     if (key[0] == 'check' and key[1] == key_doi)
+                     or (key[0] != 'check' and _doi_key(key[0]) == key_doi)]
+            for key in stale:
+                del self._doc_cache[key]
+            self._doc_cache_generation += 1
+            if present is not None:
+                self._doc_cache[('check', key_doi, None)] = present
+        # Adding documents also changes their stored references
+        _clear_forward_refs_cache()
+
+    def _clear_doc_cache(self):
+        # Called after anything that can change what is in the library
+        with self._doc_cache_lock:
+            self._doc_cache.clear()
+            self._doc_cache_generation += 1
+        # Syncing and adding documents also changes their stored references
+        _clear_forward_refs_cache()
     
     # def trash_document(self, doc_id):
     #     self.api.documents.move_to_trash(doc_id=doc_id)
@@ -2707,14 +3194,18 @@ class MendeleyLibraryInterface(LibraryInterface):
 
             # This is not wrapped in a try/except because the method calling
             # it implements the try/except.
-            doc_json = self.lib.get_document(doi, return_json=True)
+            with self._client_lock:
+                doc_json = self.lib.get_document(doi, return_json=True)
 
             if doc_json is None:
                 raise DocNotFoundError
 
             doc_id = doc_json.get('id')
 
-            self.api.documents.move_to_trash(doc_id=doc_id)
+            self._api_limiter.acquire()
+            with self._client_lock:
+                self.api.documents.move_to_trash(doc_id=doc_id)
+            self._set_doc_presence(doi, False)
 
         # Catch any other case because URL and PMID searches are
         # not yet implemented at this time.
@@ -2724,13 +3215,27 @@ class MendeleyLibraryInterface(LibraryInterface):
 
     def update_document(self, doc_id, notes):
         # This is used to add notes via a POST request
-        self.api.documents.update(doc_id=doc_id, new_data=notes)
+        self._api_limiter.acquire()
+        with self._client_lock:
+            self.api.documents.update(doc_id=doc_id, new_data=notes)
+        self._clear_doc_cache()
 
     def add_to_library(self, doi):
-        self.lib.add_to_library(doi=doi)
+        # The document can be added even when this raises (e.g. if only
+        # the PDF couldn't be retrieved), so then whether it's present
+        # is left to be looked up again
+        try:
+            with self._client_lock:
+                self.lib.add_to_library(doi=doi)
+        except Exception:
+            self._set_doc_presence(doi, None)
+            raise
+        self._set_doc_presence(doi, True)
 
     def get_file_content_from_doc_id(self, doc_id):
-        file_content, file_name, file_id = self.api.files.get_file_content_from_doc_id(doc_id=doc_id)
+        self._api_limiter.acquire()
+        with self._client_lock:
+            file_content, file_name, file_id = self.api.files.get_file_content_from_doc_id(doc_id=doc_id)
         return file_content, file_name, file_id
 
 
@@ -2784,36 +3289,72 @@ class ClickFilter(QObject):
     clicked = pyqtSignal()
     doubleclicked = pyqtSignal()
 
+    # Only one label can be clicked at a time, so every filter shares the
+    # same two timers instead of creating its own. They are created on
+    # first use, and the *_owner attributes say which filter they are
+    # timing for.
+    _click_timer = None
+    _doubleclick_timer = None
+    _click_owner = None
+    _doubleclick_owner = None
+
     def __init__(self, widget):
         super(ClickFilter, self).__init__()
         self.parent = widget
         self.highlighting = False
 
-        self.click_timer = QTimer()
-        self.click_timer.setSingleShot(True)
-        self.click_timer.timeout.connect(self.set_highlighting)
-
-        self.doubleclick_timer = QTimer()
-        self.doubleclick_timer.setSingleShot(True)
-        self.doubleclick_timer.timeout.connect(self.single_click)
+    @staticmethod
+    def _create_timers():
+        click_timer = ClickFilter._click_timer = QTimer()
+        click_timer.setSingleShot(True)
+        click_timer.timeout.connect(ClickFilter._click_timeout)
+
+        doubleclick_timer = ClickFilter._doubleclick_timer = QTimer()
+        doubleclick_timer.setSingleShot(True)
+        doubleclick_timer.timeout.connect(ClickFilter._doubleclick_timeout)
+
+    @staticmethod
+    def _click_timeout():
+        owner = ClickFilter._click_owner
+        if owner is not None:
+            owner.set_highlighting()
+
+    @staticmethod
+    def _doubleclick_timeout():
+        owner = ClickFilter._doubleclick_owner
+        ClickFilter._doubleclick_owner = None
+        if owner is not None:
+            owner.single_click()
 
     def eventFilter(self, widget, event):
+        if ClickFilter._click_timer is None:
+            ClickFilter._create_timers()
+
         if event.type() == QEvent.MouseButtonPress:
             # Start timer to determine if the mouse is being held
             # down and the user is highlighting.
-            self.click_timer.start(200)
+            ClickFilter._click_owner = self
+            ClickFilter._click_timer.start(200)
         # If the user is clicking without highlighting, send
         # the 'clicked' signal.
         if event.type() == QEvent.MouseButtonRelease:
-            self.click_timer.stop()
+            ClickFilter._click_timer.stop()
             if not self.highlighting:
-                if self.doubleclick_timer.isActive():
+                doubleclick_timer = ClickFilter._doubleclick_timer
+                if doubleclick_timer.isActive() and ClickFilter._doubleclick_owner is self:
                     if widget.rect().contains(event.pos()):
+                        doubleclick_timer.stop()
+                        ClickFilter._doubleclick_owner = None
                         self.doubleclicked.emit()
-                        self.doubleclick_timer.stop()
                         return True
                 else:
-                    self.doubleclick_timer.start(200)
+                    # A click on another label that is still waiting to
+                    # see if it's a double click counts as a single click
+                    if doubleclick_timer.isActive():
+                        doubleclick_timer.stop()
+                        ClickFilter._doubleclick_timeout()
+                    ClickFilter._doubleclick_owner = self
+                    doubleclick_timer.start(200)
             self.highlighting = False
         return False
 
@@ -2824,15 +3365,85 @@ class ClickFilter(QObject):
         self.clicked.emit()
 
 
+class WorkerSignals(QObject):
+    """
+    Signals for Worker. A QRunnable is not a QObject, so it can't
+    define signals itself.
+
+    result: the return value of the function
+    error: the exception the function raised
+    finished: emitted after either of the above
+    """
+    result = pyqtSignal(object)
+    error = pyqtSignal(object)
+    finished = pyqtSignal()
+
+    # The pool drops its worker, and with it these signals, as soon as
+    # run() returns. Hold on to them until the main thread has handled
+    # 'finished' so queued results aren't lost.
+    _live = set()
+
+    def __init__(self):
+        super(WorkerSignals, self).__init__()
+        WorkerSignals._live.add(self)
+        self.finished.connect(self._release)
+
+    def _release(self):
+        WorkerSignals._live.discard(self)
+
+
+class Worker(QRunnable):
+    """
+    Runs a function on a QThreadPool thread and reports back through
+    WorkerSignals. Slots connected to the signals from the main thread
+    run on the main thread, so they can safely update widgets.
+    """
+    def __init__(self, fn, *args, **kwargs):
+        super(Worker, self).__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as exc:
+            self.signals.error.emit(exc)
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
 # Centering the widget
 # frameGeometry gets the size of the widget I'm making.
 # QDesktopWidget finds the size of the screen
 # The self.move moves my widget's top left corner to the coords of the
 # top left corner of the centered qr frame.
+# Center of the available screen area, looked up on the first _center()
+# call and forgotten when the screens or work area change
+_screen_center = None
+_watching_screens = False
+
+
+def _forget_screen_center(*args):
+    global _screen_center
+    _screen_center = None
+
+
 def _center(widget):
+    global _screen_center, _watching_screens
+    if _screen_center is None:
+        desktop = QApplication.desktop()
+        if not _watching_screens:
+            desktop.workAreaResized.connect(_forget_screen_center)
+            desktop.screenCountChanged.connect(_forget_screen_center)
+            _watching_screens = True
+        _screen_center = desktop.availableGeometry().center()
+
     qr = widget.frameGeometry()
-    cp = QDesktopWidget().availableGeometry().center()
-    qr.moveCenter(cp)
+    qr.moveCenter(_screen_center)
     widget.move(qr.topLeft())
 
 
@@ -2843,21 +3454,553 @@ def _layout_widgets(layout):
     """
     all_widgets = []
     for i in range(layout.count()):
-        item = layout.itemAt(i).widget()
-        if type(item) is not QSpacerItem:
-            all_widgets.append(item)
+        # Spacer items have no widget
+        widget = layout.itemAt(i).widget()
+        if widget is not None:
+            all_widgets.append(widget)
     return all_widgets
 
 
+# Library syncs are long network calls, so they run here rather than on
+# the main thread. One thread keeps them from overlapping.
+_sync_pool = QThreadPool()
+_sync_pool.setMaxThreadCount(1)
+
+
+# Citation lookups run here. At most 8 run at once so we stay polite to
+# the lookup services.
+_citation_pool = QThreadPool()
+_citation_pool.setMaxThreadCount(8)
+
+
+# Papers are added to the library here, so adding them doesn't hold up
+# the GUI. Each add holds the library's client lock for the whole call
+# (the client library fetches the PDF itself), so they run one at a time.
+_add_pool = QThreadPool()
+_add_pool.setMaxThreadCount(1)
+
+
+# All database calls made through _run_in_db_thread happen on this one
+# thread, in the order they were made. The thread never expires, so
+# the database is only ever used from the thread that first opened it.
+_db_pool = QThreadPool()
+_db_pool.setMaxThreadCount(1)
+_db_pool.setExpiryTimeout(-1)
+
+
+def _run_in_db_thread(fn, *args, on_result=None, **kwargs):
+    """
+    Calls fn(*args, **kwargs) on the database thread. on_result, if given,
+    is called with the return value on the main thread. Errors are logged.
+    """
+    worker = Worker(fn, *args, **kwargs)
+    if on_result is not None:
+        worker.signals.result.connect(on_result)
+    worker.signals.error.connect(
+        lambda exc: error_logging.log(method='gui._run_in_db_thread', message=fn.__name__, error=str(exc)))
+    _db_pool.start(worker)
+
+
+# DOIs found for citation strings, keyed by the citation with whitespace
+# collapsed and lowercased. Citations no DOI was found for are kept too,
+# so they aren't looked up again. The cache is read from disk the first
+# time it's needed and written back when the program exits.
+_CITATION_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.shrew_cache', 'doi_cache.json')
+_CITATION_CACHE_SIZE = 4096
+_citation_cache = None
+_citation_cache_lock = threading.Lock()
+_citation_cache_dirty = False
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _citation_lookup(text):
+    # The citation parser wants the label's lines as one line of text
+    if '\n' in text:
+        return _WHITESPACE_RE.sub(' ', text)
+    return text
+
+
+def _normalize_citation(lookup):
+    # Collapses whitespace and case so the same citation formatted slightly
+    # differently gets the same key
+    return _WHITESPACE_RE.sub(' ', lookup).strip().lower()
+
+
+def _load_citation_cache():
+    try:
+        with open(_CITATION_CACHE_PATH, encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        # No cache yet, or it can't be read; start a new one
+        return OrderedDict()
+    return OrderedDict((key, tuple(value)) for key, value in entries.items())
+
+
+def _doi_and_title_from_citation(lookup):
+    """
+    Cached rr.doi_and_title_from_citation. Safe to call from several
+    worker threads at once.
+    """
+    global _citation_cache, _citation_cache_dirty
+    key = _normalize_citation(lookup)
+    with _citation_cache_lock:
+        if _citation_cache is None:
+            _citation_cache = _load_citation_cache()
+        if key in _citation_cache:
+            _citation_cache.move_to_end(key)
+            return _citation_cache[key]
+
+    # Errors aren't cached, so the citation is tried again next time
+    result = tuple(rr.doi_and_title_from_citation(lookup))
+
+    with _citation_cache_lock:
+        _citation_cache[key] = result
+        _citation_cache.move_to_end(key)
+        if len(_citation_cache) > _CITATION_CACHE_SIZE:
+            _citation_cache.popitem(last=False)
+        _citation_cache_dirty = True
+    return result
+
+
+def _save_citation_cache():
+    with _citation_cache_lock:
+        if not _citation_cache_dirty:
+            return
+        entries = dict(_citation_cache)
+    try:
+        os.makedirs(os.path.dirname(_CITATION_CACHE_PATH), exist_ok=True)
+        # Write to a temporary file first so a failed write can't leave
+        # a truncated cache behind
+        temp_path = _CITATION_CACHE_PATH + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(temp_path, _CITATION_CACHE_PATH)
+    except OSError as exc:
+        error_logging.log(method='gui._save_citation_cache', message='Could not save DOI cache', error=str(exc))
+
+
+atexit.register(_save_citation_cache)
+
+
+# Session cache of db.follow_refs_forward results, keyed by lowercased
+# DOI, so showing the same paper's citing papers again skips the query.
+# It is cleared whenever references in the database may have changed.
+_FORWARD_REFS_CACHE_SIZE = 64
+_forward_refs_cache = OrderedDict()
+_forward_refs_lock = threading.Lock()
+_forward_refs_generation = 0
+
+
+def _follow_refs_forward(doi):
+    """
+    Cached db.follow_refs_forward.
+    """
+    key = doi.strip().lower()
+    with _forward_refs_lock:
+        if key in _forward_refs_cache:
+            _forward_refs_cache.move_to_end(key)
+            return _forward_refs_cache[key]
+        generation = _forward_refs_generation
+
+    things = db.follow_refs_forward(doi)
+
+    with _forward_refs_lock:
+        # Don't store results that were read before the cache was cleared
+        if generation == _forward_refs_generation:
+            _forward_refs_cache[key] = things
+            if len(_forward_refs_cache) > _FORWARD_REFS_CACHE_SIZE:
+                _forward_refs_cache.popitem(last=False)
+    return things
+
+
+def _clear_forward_refs_cache():
+    global _forward_refs_generation
+    with _forward_refs_lock:
+        _forward_refs_cache.clear()
+        _forward_refs_generation += 1
+
+
+# Reference lists retrieved for papers, keyed by the paper's DOI
+# lowercased. A paper's references don't change, so going back to one
+# (or requesting them again to add or resolve them all) doesn't scrape
+# the publisher's page again. Refreshing clears the cache.
+_REFERENCES_CACHE_SIZE = 32
+_references_cache = OrderedDict()
+_references_lock = threading.Lock()
+
+# The display strings made for each cached reference list, under the same
+# key. They are dropped along with the list, and when a DOI found for one
+# of the references changes what it should show.
+_reference_texts_cache = {}
+
+
+def _retrieve_references(doi):
+    """
+    Cached rr.retrieve_only_references. Errors aren't cached.
+    """
+    key = _doi_key(doi)
+    with _references_lock:
+        if key in _references_cache:
+            _references_cache.move_to_end(key)
+            return _references_cache[key]
+
+    refs = rr.retrieve_only_references(input=doi, input_type='doi')
+
+    with _references_lock:
+        _references_cache[key] = refs
+        if len(_references_cache) > _REFERENCES_CACHE_SIZE:
+            oldest, _ = _references_cache.popitem(last=False)
+            _reference_texts_cache.pop(oldest, None)
+    return refs
+
+
+def _clear_references_cache():
+    with _references_lock:
+        _references_cache.clear()
+        _reference_texts_cache.clear()
+
+
+def _forget_reference_texts(doi):
+    # Called when one of the paper's references is changed
+    if doi is None:
+        return
+    with _references_lock:
+        _reference_texts_cache.pop(_doi_key(doi), None)
+
+
+def _retrieve_reference_texts(doi):
+    """
+    Retrieves a paper's references and makes their display strings, for
+    running on a worker thread.
+
+    Returns
+    -------
+    refs: list
+        The references, or None if there were none.
+    texts: list
+        (small_text, expanded_text) for each reference, or None.
+    """
+    refs = _retrieve_references(doi)
+    if not refs:
+        return refs, None
+
+    key = _doi_key(doi)
+    with _references_lock:
+        texts = _reference_texts_cache.get(key)
+    if texts is None:
+        texts = [_reference_texts(ref) for ref in refs]
+        with _references_lock:
+            # Only keep them while their reference list is still cached
+            if _references_cache.get(key) is refs:
+                _reference_texts_cache[key] = texts
+    return refs, texts
+
+
+# Reference changes waiting to be written by _flush_reference_updates().
+# Only used from the main thread.
+_pending_reference_updates = []
+
+
+def _queue_reference_update(**kwargs):
+    """
+    Queues a db.update_reference_field call. Nothing is written until
+    _flush_reference_updates() is called.
+    """
+    _pending_reference_updates.append(kwargs)
+
+
+def _queue_doi_update(citing_doi, doi, title, authors, date):
+    """
+    Queues the database change for a reference a DOI was found for. The
+    reference's row is found by its citing paper, date and authors if it
+    has authors, otherwise by its title. With neither, there is nothing
+    to identify it by and no change is queued.
+    """
+    if authors is not None:
+        _queue_reference_update(identifying_value=date, updating_field=['doi', 'title'],
+                                updating_value=[doi, title], citing_doi=citing_doi,
+                                authors=authors, filter_by_authors=True)
+    elif title is not None:
+        _queue_reference_update(identifying_value=title, updating_field=['doi', 'title'],
+                                updating_value=[doi, title], filter_by_title=True)
+
+
+def _flush_reference_updates():
+    """
+    Writes every queued reference change as one job on the database thread.
+    """
+    if not _pending_reference_updates:
+        return
+    updates = _pending_reference_updates[:]
+    del _pending_reference_updates[:]
+    _run_in_db_thread(_update_references, updates)
+
+
+def _add_reference(ref, main_doi):
+    # Runs on the database thread
+    try:
+        db.add_reference([ref], main_doi=main_doi)
+    finally:
+        _clear_forward_refs_cache()
+
+
+def _delete_reference(ref):
+    # Runs on the database thread
+    try:
+        db.delete_reference(ref)
+    finally:
+        _clear_forward_refs_cache()
+
+
+def _update_references(updates):
+    # Runs on the database thread
+    try:
+        for kwargs in updates:
+            db.update_reference_field(**kwargs)
+    finally:
+        _clear_forward_refs_cache()
+
+
+# db.update_entry_field calls waiting to be written. Unlike reference
+# updates these are flushed on their own: the first one queued schedules
+# a flush for when control returns to the event loop, so every status
+# change made while handling one event is written in a single job.
+_pending_entry_updates = []
+
+
+def _queue_entry_update(**kwargs):
+    """
+    Queues a db.update_entry_field call to be written on the database
+    thread once the current event has been handled.
+    """
+    if not _pending_entry_updates:
+        QTimer.singleShot(0, _flush_entry_updates)
+    _pending_entry_updates.append(kwargs)
+
+
+def _flush_entry_updates():
+    if not _pending_entry_updates:
+        return
+    updates = _pending_entry_updates[:]
+    del _pending_entry_updates[:]
+    _run_in_db_thread(_update_entries, updates)
+
+
+def _update_entries(updates):
+    # Runs on the database thread
+    for kwargs in updates:
+        db.update_entry_field(**kwargs)
+
+
+def _add_to_library(window, doi):
+    """
+    Adds the paper to window's library on a worker thread, since the
+    paper's PDF is downloaded as part of adding it. Once that is over,
+    the DOI is added to the window's history and its status updated.
+    """
+    def added(result=None):
+        window.response_label.hide()
+        window.doc_selector.add_to_history(doi)
+        window.update_document_status(doi, adding=True)
+
+    def failed(exc):
+        method = 'gui.Window.add_to_library_from_main'
+        if isinstance(exc, UnsupportedPublisherError):
+            error_logging.log(method=method, message='Unsupported publisher', error=str(exc), doi=doi)
+            window.response_label.hide()
+            _send_msg('Publisher is not yet supported.\nDocument not added.')
+            return
+        if isinstance(exc, CallFailedException):
+            error_logging.log(method=method, message='Call failed', error=str(exc), doi=doi)
+            _send_msg(str(exc))
+        elif isinstance(exc, (ParseException, AttributeError)):
+            error_logging.log(method=method, message='Error while parsing article webpage', error=str(exc), doi=doi)
+            _send_msg('Error while parsing article webpage.')
+        elif isinstance(exc, PDFError):
+            _send_msg('PDF could not be retrieved.')
+        else:
+            error_logging.log(method=method, error=str(exc), doi=doi)
+            _send_msg(str(exc))
+        # The document may have been added without its file, so the
+        # status is still checked
+        added()
+
+    worker = Worker(window.library.add_to_library, doi)
+    worker.signals.result.connect(added)
+    worker.signals.error.connect(failed)
+    QThreadPool.globalInstance().start(worker)
+
+
+# Callbacks for syncs that are queued on the sync thread but haven't
+# started, by library. Asking for a sync while one is still waiting just
+# adds the callback to it, so a burst of adds and status updates runs
+# one sync rather than one each.
+_waiting_syncs = {}
+_waiting_syncs_lock = threading.Lock()
+
+
+def _trash_document(window, entry_type, value):
+    """
+    Moves the document to trash on a worker thread, since the API call
+    is paced by the rate limiter. Once it is done, the entry is added to
+    the window's history and its status updated.
+    """
+    def trashed(result=None):
+        window.doc_selector.add_to_history(value)
+        window.update_document_status(doi=value)
+
+    def failed(exc):
+        if isinstance(exc, DocNotFoundError):
+            _send_msg('Document not found in library.')
+        elif isinstance(exc, UnsupportedEntryTypeError):
+            _send_msg('Only functions using DOIs are supported at this time.')
+        else:
+            error_logging.log(method='gui.Window.move_to_trash', error=str(exc), doi=value)
+            _send_msg(str(exc))
+
+    worker = Worker(window.library.trash_document, **{entry_type: value})
+    worker.signals.result.connect(trashed)
+    worker.signals.error.connect(failed)
+    QThreadPool.globalInstance().start(worker)
+
+
+def _start_sync(library, callback=None):
+    """
+    Syncs the library on the sync thread. callback, if given, is called
+    on the main thread once the sync is over (whether or not it failed).
+    If a sync of the library is already waiting to start, the callback
+    is attached to that sync instead of queueing another. Errors are logged.
+    """
+    with _waiting_syncs_lock:
+        callbacks = _waiting_syncs.get(library)
+        if callbacks is not None:
+            if callback is not None:
+                callbacks.append(callback)
+            return
+        callbacks = _waiting_syncs[library] = []
+        if callback is not None:
+            callbacks.append(callback)
+
+    def sync():
+        # Anything asked for from here on needs a sync of its own, since
+        # this one may already have missed it
+        with _waiting_syncs_lock:
+            del _waiting_syncs[library]
+        library.sync()
+
+    def synced():
+        for callback in callbacks:
+            callback()
+
+    worker = Worker(sync)
+    worker.signals.error.connect(
+        lambda exc: error_logging.log(method='gui._start_sync', message='Error syncing library', error=str(exc)))
+    worker.signals.finished.connect(synced)
+    _sync_pool.start(worker)
+
+
+def _add_widgets(layout, widgets):
+    """
+    Appends widgets to the end of a reference layout, whose stretch sits at
+    the top. Updates on the containing widget are held off until all of
+    them are in, so it is repainted once rather than once per widget.
+    """
+    container = layout.parentWidget()
+    container.setUpdatesEnabled(False)
+    try:
+        for widget in widgets:
+            layout.addWidget(widget)
+    finally:
+        container.setUpdatesEnabled(True)
+
+
+def _reference_texts(ref):
+    """
+    Returns a reference label's (small_text, expanded_text), with the
+    small text cut off to fit within the window.
+    """
+    small_text, expanded_text = _format_reference(ref)
+    if len(small_text) > 66:
+        small_text = td(small_text, 66)
+    return small_text, expanded_text
+
+
+def _doi_key(doi):
+    # DOIs are case-insensitive. Lookups by anything else (None, a PMID)
+    # are kept as they are.
+    if isinstance(doi, str):
+        return doi.strip().lower()
+    return doi
+
+
+def _format_reference(ref):
+    """
+    Builds the display strings for a reference label. Each string is
+    collected as a list of pieces and joined once.
+
+    Parameters
+    ----------
+    ref: dict
+        Contains information from a single paper reference.
+
+    Returns
+    -------
+    small_text: str
+        Abbreviated preview, before it is cut to fit the window.
+    expanded_text: str
+        Additional information for the larger reference view
+        when a label is clicked.
+    """
+    get = ref.get
+    ref_id, ref_title, ref_author_list, ref_doi = get('ref_id'), get('title'), get('authors'), get('doi')
+    ref_publication = get('publication')
+    ref_year = get('year')
+    if ref_year is None:
+        ref_year = get('date')
+
+    if isinstance(ref_author_list, str):
+        ref_author_list = ref_author_list.split('; ')
+
+    small_parts = []
+    expanded_parts = []
+    if ref_id is not None:
+        small_parts.append(str(ref_id) + '. ')
+        expanded_parts.append(str(ref_id) + '. ')
+
+    # Short and long author lists
+    if ref_author_list is not None:
+        ref_full_authors = '; '.join(ref_author_list)
+        if len(ref_author_list) > 2:
+            small_parts.extend((ref_author_list[0], ', ', ref_author_list[1], ', et al.'))
+        else:
+            small_parts.append(ref_full_authors)
+        expanded_parts.append(ref_full_authors)
+
+    if ref_publication is not None:
+        expanded_parts.extend(('\n', ref_publication))
+    if ref_year is not None:
+        small_parts.extend((', ', ref_year))
+        expanded_parts.extend((', ', ref_year))
+    if ref_title is not None:
+        small_parts.extend((', ', ref_title))
+        expanded_parts.extend(('\n', ref_title))
+    if ref_doi is not None:
+        expanded_parts.extend(('\n', ref_doi))
+
+    return ''.join(small_parts), ''.join(expanded_parts)
+
+
 def _delete_all_widgets(layout):
-    if type(layout.itemAt(0)) == QSpacerItem:
-        startIndex = 1
-    else:
-        startIndex = 0
-    while layout.count() > 1:
-        item = layout.itemAt(startIndex).widget()
-        layout.removeWidget(item)
-        item.deleteLater()
+    # Take the items from the end so nothing has to shift down, leaving
+    # the stretch at the top in place
+    start = 1 if isinstance(layout.itemAt(0), QSpacerItem) else 0
+    for i in range(layout.count() - 1, start - 1, -1):
+        widget = layout.takeAt(i).widget()
+        if widget is not None:
+            widget.removed = True
+            widget.deleteLater()
 
 
 def _copy_to_clipboard(text):
@@ -2867,6 +4010,14 @@ def _copy_to_clipboard(text):
     app.sendEvent(clipboard, event)
 
 
+def _copy_selection():
+    # Copies the text selected in whichever widget has focus. Each window
+    # has one Copy shortcut rather than one per widget.
+    widget = QApplication.focusWidget()
+    if widget is not None and hasattr(widget, 'selectedText'):
+        _copy_to_clipboard(widget.selectedText())
+
+
 def _send_msg(message):
     QMessageBox.information(QMessageBox(), 'Information', message)
 
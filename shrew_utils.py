@@ -1,7 +1,65 @@
+import re
+import time
+import importlib
+import threading
+
+# DOIs start with the '10.' directory indicator, a registrant code of
+# 4 to 9 digits and a slash
+_DOI_RE = re.compile(r'10\.\d{4,9}/')
+
+
 def get_truncated_display_string(input_string,max_length = 50):
     if input_string is None:
         return None
     elif len(input_string) > max_length:
         return str(input_string[:max_length]) + '...'
     else:
-        return input_string
\ No newline at end of file
+        return input_string
+
+
+def is_valid_doi(doi):
+    return doi is not None and _DOI_RE.match(doi) is not None
+
+
+class LazyModule(object):
+    """
+    Stands in for a module that is only imported the first time one of
+    its attributes is used, so importing the module doesn't slow down
+    startup when it isn't needed yet.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        # Only called for attributes not found on the proxy itself
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+
+class TokenBucket(object):
+    """
+    Limits how often something can happen. Up to `capacity` calls to
+    acquire() go through at once, after which tokens come back at `rate`
+    per second and acquire() sleeps until its turn. Thread safe.
+    """
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # The token is taken now even if it has to be waited for, so
+            # callers that come later queue up behind this one
+            self._tokens -= 1
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
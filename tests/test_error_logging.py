@@ -0,0 +1,62 @@
+import csv
+import re
+import logging.handlers
+
+import pytest
+
+import error_logging
+
+
+@pytest.fixture
+def log_path(tmp_path, monkeypatch):
+    """
+    Points the log listener at a file in tmp_path for the test, so the
+    real log file isn't written to.
+    """
+    path = tmp_path / 'logfile.txt'
+    handler = logging.handlers.RotatingFileHandler(str(path), encoding='utf-8', delay=True)
+    handler.setFormatter(error_logging._EntryFormatter())
+    handler.terminator = ''
+
+    listener = error_logging._listener
+    with error_logging._sync_lock:
+        monkeypatch.setattr(listener, 'handlers', (handler,))
+        monkeypatch.setattr(error_logging, '_file_handler', handler)
+    yield path
+    with error_logging._sync_lock:
+        monkeypatch.undo()
+    handler.close()
+
+
+def _read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_log_round_trips_through_csv(log_path):
+    error_logging.log(message='Bad page, "quoted"\nover two lines', method='gui.Window.get_refs',
+                      error='oops', doi='10.1000/abc', ref_index=3, main_lookup='10.1000/xyz')
+    error_logging.log_sync()
+
+    rows = _read_rows(log_path)
+    assert len(rows) == 1
+    timestamp, method, message, error, doi, ref_info = rows[0]
+    assert re.match(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', timestamp)
+    assert method == 'gui.Window.get_refs'
+    assert message == 'Bad page, "quoted"\nover two lines'
+    assert error == 'oops'
+    assert doi == '10.1000/abc'
+    assert ref_info == 'Reference number 3 of paper with doi 10.1000/xyz'
+
+
+def test_log_keeps_columns_for_missing_fields(log_path):
+    error_logging.log(message='only a message')
+    error_logging.log(method='gui.Window.resync', ref_index=2)
+    error_logging.log_sync()
+
+    rows = _read_rows(log_path)
+    assert [row[1:] for row in rows] == [
+        ['', 'only a message', '', '', ''],
+        # Without the paper it came from, the reference number isn't logged
+        ['gui.Window.resync', '', '', '', ''],
+    ]
@@ -0,0 +1,74 @@
+import pytest
+
+import shrew_utils
+from shrew_utils import TokenBucket
+
+
+class FakeTime(object):
+    """
+    Stands in for the time module. sleep() records how long it was asked
+    to wait and moves the clock forward by that much.
+    """
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(shrew_utils, 'time', fake)
+    return fake
+
+
+def test_token_bucket_burst_goes_through(fake_time):
+    bucket = TokenBucket(3, 2.0)
+    for _ in range(3):
+        bucket.acquire()
+    assert fake_time.sleeps == []
+
+
+def test_token_bucket_waits_once_empty(fake_time):
+    bucket = TokenBucket(3, 2.0)
+    for _ in range(3):
+        bucket.acquire()
+
+    # Tokens come back at 2 a second, so each call after the burst waits
+    # half a second behind the one before it
+    bucket.acquire()
+    bucket.acquire()
+    assert fake_time.sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+
+
+def test_token_bucket_refills_up_to_capacity(fake_time):
+    bucket = TokenBucket(2, 1.0)
+    bucket.acquire()
+    bucket.acquire()
+
+    # Far more time passes than it takes to refill, but only `capacity`
+    # tokens are banked
+    fake_time.now += 10
+    bucket.acquire()
+    bucket.acquire()
+    assert fake_time.sleeps == []
+
+    bucket.acquire()
+    assert fake_time.sleeps == [pytest.approx(1.0)]
+
+
+def test_token_bucket_partial_refill(fake_time):
+    bucket = TokenBucket(1, 4.0)
+    bucket.acquire()
+
+    # A quarter of a token has come back, so the next call waits for the
+    # remaining three quarters
+    fake_time.now += 0.0625
+    bucket.acquire()
+    assert fake_time.sleeps == [pytest.approx(0.1875)]